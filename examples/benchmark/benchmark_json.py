@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+
+import argparse
+import glob
+import os.path as osp
+import time
+
+from labelme import label_file
+
+here = osp.dirname(osp.abspath(__file__))
+
+
+def get_json_files(paths):
+    json_files = []
+    for path in paths:
+        if osp.isdir(path):
+            json_files.extend(
+                sorted(glob.glob(osp.join(path, "**", "*.json"), recursive=True))
+            )
+        else:
+            json_files.append(path)
+    return json_files
+
+
+def measure(func, args, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t_start = time.perf_counter()
+        for arg in args:
+            func(arg)
+        best = min(best, time.perf_counter() - t_start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument(
+        "paths",
+        nargs="*",
+        default=[osp.join(here, "../tutorial/apc2016_obj3.json")],
+        help="label files or directories of label files",
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="best of repeats")
+    args = parser.parse_args()
+
+    json_files = get_json_files(args.paths)
+    contents = []
+    for json_file in json_files:
+        with open(json_file, "rb") as f:
+            contents.append(f.read())
+    size = sum(len(content) for content in contents)
+    print(
+        "{} label files, {:.1f} MB, best of {}\n".format(
+            len(contents), size / 1e6, args.repeat
+        )
+    )
+
+    label_file.set_json_backend("json")
+    datas = [label_file.json_loads(content) for content in contents]
+
+    print("{:<8} {:>12} {:>12}".format("backend", "load [ms]", "dump [ms]"))
+    for backend in label_file.JSON_BACKENDS:
+        try:
+            label_file.set_json_backend(backend)
+        except ImportError:
+            print("{:<8} {:>12}".format(backend, "not installed"))
+            continue
+        t_load = measure(label_file.json_loads, contents, args.repeat)
+        t_dump = measure(label_file.json_dumps, datas, args.repeat)
+        print("{:<8} {:>12.1f} {:>12.1f}".format(backend, t_load * 1e3, t_dump * 1e3))
+    label_file.set_json_backend()
+
+
+if __name__ == "__main__":
+    main()
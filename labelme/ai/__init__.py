@@ -1,14 +1,19 @@
 import gdown
 
 from .efficient_sam import EfficientSam
+from .embedding_cache import DEFAULT_MAX_BYTES
 from .segment_anything_model import SegmentAnythingModel
 
 
 class SegmentAnythingModelVitB(SegmentAnythingModel):
     name = "SegmentAnything (speed)"
 
-    def __init__(self):
+    def __init__(
+        self, session_options=None, embedding_cache_max_bytes=DEFAULT_MAX_BYTES
+    ):
         super().__init__(
+            session_options=session_options,
+            embedding_cache_max_bytes=embedding_cache_max_bytes,
             encoder_path=gdown.cached_download(
                 url="https://github.com/wkentaro/labelme/releases/download/sam-20230416/sam_vit_b_01ec64.quantized.encoder.onnx",  # NOQA
                 md5="80fd8d0ab6c6ae8cb7b3bd5f368a752c",
@@ -23,8 +28,12 @@ class SegmentAnythingModelVitB(SegmentAnythingModel):
 class SegmentAnythingModelVitL(SegmentAnythingModel):
     name = "SegmentAnything (balanced)"
 
-    def __init__(self):
+    def __init__(
+        self, session_options=None, embedding_cache_max_bytes=DEFAULT_MAX_BYTES
+    ):
         super().__init__(
+            session_options=session_options,
+            embedding_cache_max_bytes=embedding_cache_max_bytes,
             encoder_path=gdown.cached_download(
                 url="https://github.com/wkentaro/labelme/releases/download/sam-20230416/sam_vit_l_0b3195.quantized.encoder.onnx",  # NOQA
                 md5="080004dc9992724d360a49399d1ee24b",
@@ -39,8 +48,12 @@ class SegmentAnythingModelVitL(SegmentAnythingModel):
 class SegmentAnythingModelVitH(SegmentAnythingModel):
     name = "SegmentAnything (accuracy)"
 
-    def __init__(self):
+    def __init__(
+        self, session_options=None, embedding_cache_max_bytes=DEFAULT_MAX_BYTES
+    ):
         super().__init__(
+            session_options=session_options,
+            embedding_cache_max_bytes=embedding_cache_max_bytes,
             encoder_path=gdown.cached_download(
                 url="https://github.com/wkentaro/labelme/releases/download/sam-20230416/sam_vit_h_4b8939.quantized.encoder.onnx",  # NOQA
                 md5="958b5710d25b198d765fb6b94798f49e",
@@ -55,8 +68,12 @@ class SegmentAnythingModelVitH(SegmentAnythingModel):
 class EfficientSamVitT(EfficientSam):
     name = "EfficientSam (speed)"
 
-    def __init__(self):
+    def __init__(
+        self, session_options=None, embedding_cache_max_bytes=DEFAULT_MAX_BYTES
+    ):
         super().__init__(
+            session_options=session_options,
+            embedding_cache_max_bytes=embedding_cache_max_bytes,
             encoder_path=gdown.cached_download(
                 url="https://github.com/labelmeai/efficient-sam/releases/download/onnx-models-20231225/efficient_sam_vitt_encoder.onnx",  # NOQA
                 md5="2d4a1303ff0e19fe4a8b8ede69c2f5c7",
@@ -71,8 +88,12 @@ class EfficientSamVitT(EfficientSam):
 class EfficientSamVitS(EfficientSam):
     name = "EfficientSam (accuracy)"
 
-    def __init__(self):
+    def __init__(
+        self, session_options=None, embedding_cache_max_bytes=DEFAULT_MAX_BYTES
+    ):
         super().__init__(
+            session_options=session_options,
+            embedding_cache_max_bytes=embedding_cache_max_bytes,
             encoder_path=gdown.cached_download(
                 url="https://github.com/labelmeai/efficient-sam/releases/download/onnx-models-20231225/efficient_sam_vits_encoder.onnx",  # NOQA
                 md5="7d97d23e8e0847d4475ca7c9f80da96d",
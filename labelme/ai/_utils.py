@@ -1,3 +1,6 @@
+import collections
+import threading
+
 import imgviz
 import numpy as np
 import skimage
@@ -5,6 +8,101 @@ import skimage
 from labelme.logger import logger
 
 
+class DecoderCache(object):
+    """LRU cache of the masks and polygons decoded from prompt points.
+
+    Entries are keyed by the image embedding and the prompt points rounded to
+    pixels, and the rounded points are the ones decoded. The embedding is
+    compared by identity, so a new image never hits the cache. Masks are full
+    image size, hence the small default size.
+    """
+
+    def __init__(self, maxsize=8):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()
+
+    def _get(self, image_embedding, points, point_labels, compute_mask):
+        points = [[int(round(x)), int(round(y))] for x, y in points]
+        point_labels = [int(label) for label in point_labels]
+        key = (
+            id(image_embedding),
+            tuple(tuple(point) for point in points),
+            tuple(point_labels),
+        )
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] is image_embedding:
+                self._entries.move_to_end(key)
+                return entry
+
+        mask = compute_mask(points=points, point_labels=point_labels)
+        # [image_embedding, mask, polygon computed on demand]
+        entry = [image_embedding, mask, None]
+        with self._lock:
+            self._entries[key] = entry
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return entry
+
+    def get_mask(self, image_embedding, points, point_labels, compute_mask):
+        """Return the mask decoded by compute_mask(points, point_labels)."""
+        return self._get(image_embedding, points, point_labels, compute_mask)[1]
+
+    def get_polygon(self, image_embedding, points, point_labels, compute_mask):
+        entry = self._get(image_embedding, points, point_labels, compute_mask)
+        if entry[2] is None:
+            entry[2] = compute_polygon_from_mask(mask=entry[1])
+        return entry[2]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def run_encoder(session, input_name, inputs):
+    """Return the first output of an image encoder for each of inputs.
+
+    inputs have a batch axis of 1. They are run as one batch if the encoder's
+    batch axis is dynamic and they have the same shape, one by one otherwise.
+    Each output keeps a batch axis of 1, like a single run.
+    """
+    (batch_size,) = [x.shape[0] for x in session.get_inputs() if x.name == input_name]
+    if (
+        len(inputs) == 1
+        or isinstance(batch_size, int)
+        or len(set(x.shape for x in inputs)) > 1
+    ):
+        return [
+            session.run(output_names=None, input_feed={input_name: x})[0]
+            for x in inputs
+        ]
+    outputs = session.run(
+        output_names=None, input_feed={input_name: np.concatenate(inputs)}
+    )[0]
+    return [outputs[i : i + 1] for i in range(len(inputs))]
+
+
+_ONNX_DTYPES = {
+    "tensor(float)": np.float32,
+    "tensor(float16)": np.float16,
+    "tensor(double)": np.float64,
+}
+
+
+def output_nbytes(session):
+    """Return the size of the first output of an encoder for one image.
+
+    None is returned if it is not known before running the encoder, e.g. if
+    an axis other than the batch one is dynamic.
+    """
+    output = session.get_outputs()[0]
+    dtype = _ONNX_DTYPES.get(output.type)
+    if dtype is None or not all(isinstance(n, int) for n in output.shape[1:]):
+        return None
+    return int(np.prod(output.shape[1:])) * np.dtype(dtype).itemsize
+
+
 def _get_contour_length(contour):
     contour_start = contour
     contour_end = np.r_[contour[1:], contour[0:1]]
@@ -1,4 +1,5 @@
-import collections
+import functools
+import os.path as osp
 import threading
 
 import imgviz
@@ -8,64 +9,132 @@ import skimage
 
 from ..logger import logger
 from . import _utils
+from .embedding_cache import DEFAULT_MAX_BYTES
+from .embedding_cache import EmbeddingCache
+from .embedding_cache import image_key
 
 
 class EfficientSam:
-    def __init__(self, encoder_path, decoder_path):
-        self._encoder_session = onnxruntime.InferenceSession(encoder_path)
-        self._decoder_session = onnxruntime.InferenceSession(decoder_path)
+    def __init__(
+        self,
+        encoder_path,
+        decoder_path,
+        session_options=None,
+        embedding_cache_max_bytes=DEFAULT_MAX_BYTES,
+    ):
+        self._encoder_session = onnxruntime.InferenceSession(
+            encoder_path, sess_options=session_options
+        )
+        self._decoder_session = onnxruntime.InferenceSession(
+            decoder_path, sess_options=session_options
+        )
 
         self._lock = threading.Lock()
-        self._image_embedding_cache = collections.OrderedDict()
+        self.image_embedding_cache = EmbeddingCache(
+            name=osp.splitext(osp.basename(encoder_path))[0],
+            max_bytes=embedding_cache_max_bytes,
+        )
+        self._decoder_cache = _utils.DecoderCache()
 
         self._thread = None
 
     def set_image(self, image: np.ndarray):
         with self._lock:
             self._image = image
-            self._image_embedding = self._image_embedding_cache.get(
-                self._image.tobytes()
-            )
+            self._image_embedding = None
 
-        if self._image_embedding is None:
-            self._thread = threading.Thread(
-                target=self._compute_and_cache_image_embedding
-            )
-            self._thread.start()
+        # the image is hashed to look up the cache in the thread too
+        self._thread = threading.Thread(target=self._compute_and_cache_image_embedding)
+        self._thread.start()
 
     def _compute_and_cache_image_embedding(self):
         with self._lock:
-            logger.debug("Computing image embedding...")
-            image = imgviz.rgba2rgb(self._image)
-            batched_images = image.transpose(2, 0, 1)[None].astype(np.float32) / 255.0
-            (self._image_embedding,) = self._encoder_session.run(
-                output_names=None,
-                input_feed={"batched_images": batched_images},
+            image = self._image
+            # waits for the prefetch of the same image if it is running
+            self._image_embedding = self.image_embedding_cache.get_or_compute(
+                image_key(image),
+                functools.partial(self._compute_image_embedding, image),
             )
-            if len(self._image_embedding_cache) > 10:
-                self._image_embedding_cache.popitem(last=False)
-            self._image_embedding_cache[self._image.tobytes()] = self._image_embedding
-            logger.debug("Done computing image embedding.")
+
+    def _compute_image_embedding(self, image):
+        logger.debug("Computing image embedding...")
+        image_embedding = _compute_image_embedding(
+            encoder_session=self._encoder_session, image=image
+        )
+        logger.debug("Done computing image embedding.")
+        return image_embedding
+
+    def prefetch_image_embedding(self, image: np.ndarray):
+        """Compute the embedding of an image to be set later into the cache."""
+        key = image_key(image)
+        if key in self.image_embedding_cache:
+            return
+        # the embedding of the image already set is needed first
+        thread = self._thread
+        if thread is not None:
+            thread.join()
+        self.image_embedding_cache.get_or_compute(
+            key, functools.partial(self._compute_image_embedding, image)
+        )
+
+    def image_embedding_nbytes(self):
+        """Return the size of an image embedding, None if it varies."""
+        return _utils.output_nbytes(self._encoder_session)
+
+    def preprocess_image(self, image: np.ndarray):
+        """Return the encoder input of an image, with a batch axis of 1."""
+        return _preprocess_image(image)
+
+    def compute_image_embeddings(self, inputs):
+        """Return the embeddings of preprocessed images, batched if possible."""
+        return _utils.run_encoder(self._encoder_session, "batched_images", inputs)
 
     def _get_image_embedding(self):
-        if self._thread is not None:
-            self._thread.join()
-            self._thread = None
+        # also called from the preview's prediction thread
+        thread = self._thread
+        if thread is not None:
+            thread.join()
         with self._lock:
             return self._image_embedding
 
-    def predict_mask_from_points(self, points, point_labels):
-        return _compute_mask_from_points(
+    def _compute_mask(self, image_embedding):
+        return functools.partial(
+            _compute_mask_from_points,
             decoder_session=self._decoder_session,
             image=self._image,
-            image_embedding=self._get_image_embedding(),
+            image_embedding=image_embedding,
+        )
+
+    def predict_mask_from_points(self, points, point_labels):
+        image_embedding = self._get_image_embedding()
+        return self._decoder_cache.get_mask(
+            image_embedding,
             points=points,
             point_labels=point_labels,
+            compute_mask=self._compute_mask(image_embedding),
         )
 
     def predict_polygon_from_points(self, points, point_labels):
-        mask = self.predict_mask_from_points(points=points, point_labels=point_labels)
-        return _utils.compute_polygon_from_mask(mask=mask)
+        image_embedding = self._get_image_embedding()
+        return self._decoder_cache.get_polygon(
+            image_embedding,
+            points=points,
+            point_labels=point_labels,
+            compute_mask=self._compute_mask(image_embedding),
+        )
+
+
+def _preprocess_image(image):
+    image = imgviz.rgba2rgb(image)
+    return image.transpose(2, 0, 1)[None].astype(np.float32) / 255.0
+
+
+def _compute_image_embedding(encoder_session, image):
+    (image_embedding,) = encoder_session.run(
+        output_names=None,
+        input_feed={"batched_images": _preprocess_image(image)},
+    )
+    return image_embedding
 
 
 def _compute_mask_from_points(
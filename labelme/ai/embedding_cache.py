@@ -0,0 +1,175 @@
+import collections
+import hashlib
+import io
+import os
+import os.path as osp
+import threading
+
+import numpy as np
+
+from .. import utils
+from ..logger import logger
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+
+DEFAULT_MAX_BYTES = 2 << 30
+
+
+def get_default_cache_dir():
+    return osp.join(osp.expanduser("~"), ".cache", "labelme", "embeddings")
+
+
+def image_key(image):
+    """Return a content hash of the image array, without copying it."""
+    image = np.ascontiguousarray(image)
+    if xxhash is not None:
+        hasher = xxhash.xxh3_128()
+    else:
+        hasher = hashlib.blake2b(digest_size=16)
+    hasher.update("{}{}".format(image.shape, image.dtype.str).encode("ascii"))
+    hasher.update(image.data)
+    return hasher.hexdigest()
+
+
+class EmbeddingCache(object):
+    """Image embeddings of a model, in memory and persisted as .npy files.
+
+    Embeddings are keyed by image_key. The most recently used ones are kept
+    in memory, and all are saved to cache_dir/<name>, which is trimmed to
+    max_bytes by removing the least recently used files. Their total size is
+    scanned on the first put() and then kept up to date, the directory is only
+    scanned again when it exceeds max_bytes. A cache_dir of None
+    disables the disk store. get_or_compute() computes an embedding missing
+    from the cache once, even when asked by several threads.
+    """
+
+    def __init__(
+        self, name, cache_dir="default", memory_size=10, max_bytes=DEFAULT_MAX_BYTES
+    ):
+        if cache_dir == "default":
+            cache_dir = get_default_cache_dir()
+        self.cache_dir = None if cache_dir is None else osp.join(cache_dir, name)
+        self.memory_size = memory_size
+        self.max_bytes = max_bytes
+
+        self._lock = threading.Lock()
+        self._memory = collections.OrderedDict()
+        self._computing = {}  # key -> threading.Event set when computed
+        self._disk_bytes = None  # size of the saved files, None until scanned
+
+    def _path(self, key):
+        return osp.join(self.cache_dir, key + ".npy")
+
+    def get(self, key):
+        with self._lock:
+            embedding = self._memory.get(key)
+            if embedding is not None:
+                self._memory.move_to_end(key)
+                return embedding
+        if self.cache_dir is None:
+            return None
+
+        path = self._path(key)
+        try:
+            embedding = np.load(path)
+            os.utime(path)  # mark as recently used
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring broken embedding {}: {}".format(path, e))
+            return None
+        self._remember(key, embedding)
+        return embedding
+
+    def put(self, key, embedding):
+        self._remember(key, embedding)
+        if self.cache_dir is None:
+            return
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with io.BytesIO() as f:
+                np.save(f, embedding)
+                data = f.getvalue()
+            if self._disk_bytes is None:
+                self._trim()
+            path = self._path(key)
+            try:
+                replaced = os.stat(path).st_size
+            except FileNotFoundError:
+                replaced = 0
+            utils.atomic_write(path, data)
+            with self._lock:
+                self._disk_bytes += len(data) - replaced
+                trim = self._disk_bytes > self.max_bytes
+            if trim:
+                self._trim()
+        except OSError as e:
+            logger.warning("Failed to save embedding {}: {}".format(key, e))
+
+    def get_or_compute(self, key, compute):
+        """Return the embedding of key, put by compute() if it is not cached.
+
+        If another thread is computing it, e.g. a prefetch of the image, its
+        result is waited for instead of being computed again.
+        """
+        while True:
+            embedding = self.get(key)
+            if embedding is not None:
+                return embedding
+            with self._lock:
+                if key in self._memory:  # put since get()
+                    continue
+                event = self._computing.get(key)
+                if event is None:
+                    event = self._computing[key] = threading.Event()
+                    break
+            event.wait()  # and get it, or compute it if that failed
+
+        try:
+            embedding = compute()
+            self.put(key, embedding)
+            return embedding
+        finally:
+            with self._lock:
+                del self._computing[key]
+            event.set()
+
+    def __contains__(self, key):
+        with self._lock:
+            if key in self._memory:
+                return True
+        return self.cache_dir is not None and osp.exists(self._path(key))
+
+    def _remember(self, key, embedding):
+        with self._lock:
+            self._memory[key] = embedding
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)
+
+    def _trim(self):
+        entries = []
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if not entry.name.endswith(".npy"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue  # removed meanwhile, e.g. by another trim
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+        with self._lock:
+            self._disk_bytes = total
@@ -0,0 +1,228 @@
+import imgviz
+from qtpy import QtCore
+from qtpy import QtGui
+
+import labelme.utils
+from labelme.logger import logger
+
+
+def model_input_image(image):
+    """Return the RGBA array of a QImage that is given to the AI models.
+
+    Embeddings are cached by the content of this array, so the shown image and
+    the prefetched ones must be converted the same way.
+    """
+    return labelme.utils.img_qt_to_arr(
+        image.convertToFormat(QtGui.QImage.Format_RGBA8888)
+    )
+
+
+def predict_shape(model, createMode, points, point_labels):
+    """Predict the shape drawn by clicking points in an AI create mode.
+
+    Return (points, mask): for 'ai_polygon' the vertices of the polygon and
+    None, for 'ai_mask' the top-left and bottom-right corners of the mask's
+    bounding box and the mask cropped to it.
+    """
+    if createMode == "ai_polygon":
+        polygon = model.predict_polygon_from_points(
+            points=points, point_labels=point_labels
+        )
+        return [(x, y) for x, y in polygon], None
+    if createMode == "ai_mask":
+        mask = model.predict_mask_from_points(points=points, point_labels=point_labels)
+        y1, x1, y2, x2 = imgviz.instances.masks_to_bboxes([mask])[0].astype(int)
+        return [(x1, y1), (x2, y2)], mask[y1 : y2 + 1, x1 : x2 + 1]
+    raise ValueError("Unsupported createMode: %s" % createMode)
+
+
+def _prediction_key(createMode, points, point_labels):
+    return createMode, tuple(tuple(point) for point in points), tuple(point_labels)
+
+
+class AiPredictionSignals(QtCore.QObject):
+    finished = QtCore.Signal(int, object, object)
+
+
+class AiPredictionTask(QtCore.QRunnable):
+    def __init__(self, generation, model, key):
+        super(AiPredictionTask, self).__init__()
+        self.generation = generation
+        self.model = model
+        self.key = key
+        self.signals = AiPredictionSignals()
+
+    def run(self):
+        createMode, points, point_labels = self.key
+        try:
+            prediction = predict_shape(
+                self.model,
+                createMode,
+                points=[list(point) for point in points],
+                point_labels=list(point_labels),
+            )
+        except Exception as e:
+            logger.error("Failed to predict shape: {}".format(e))
+            prediction = None
+        self.signals.finished.emit(self.generation, self.key, prediction)
+
+
+class AiPredictionScheduler(QtCore.QObject):
+    """Predict the AI preview of the shape being drawn in a worker thread.
+
+    request() is cheap and can be called on every repaint: requests are
+    debounced by delay ms, one prediction runs at a time and a newer request
+    replaces the one waiting, so stale positions are never predicted.
+    predicted is emitted when a prediction finished, which result() then
+    returns until the clicked points change.
+    """
+
+    predicted = QtCore.Signal()
+
+    def __init__(self, delay=30, parent=None):
+        super(AiPredictionScheduler, self).__init__(parent)
+        self._requested = None  # key of the latest request
+        self._waiting = None  # (model, key) of the request not started yet
+        self._running = False
+        self._generation = 0
+        self._result = None  # (key, prediction)
+
+        self._pool = QtCore.QThreadPool(self)
+        self._pool.setMaxThreadCount(1)
+        self._timer = QtCore.QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(delay)
+        self._timer.timeout.connect(self._start)
+
+    def request(self, model, createMode, points, point_labels):
+        key = _prediction_key(createMode, points, point_labels)
+        if key == self._requested:
+            return
+        self._requested = key
+        self._waiting = (model, key)
+        if not self._running:
+            self._timer.start()
+
+    def result(self, createMode, points, point_labels):
+        """Return the latest (points, mask) predicted for the clicked points.
+
+        points and point_labels are the clicked ones, the latest prediction is
+        returned whatever the position of the last (hovered) point was.
+        """
+        if self._result is None:
+            return None
+        (resultMode, resultPoints, resultLabels), prediction = self._result
+        if (
+            prediction is None
+            or resultMode != createMode
+            or resultPoints[:-1] != tuple(tuple(point) for point in points)
+            or resultLabels[:-1] != tuple(point_labels)
+        ):
+            return None
+        return prediction
+
+    def get(self, createMode, points, point_labels):
+        """Return the (points, mask) predicted for exactly these points."""
+        if self._result is None:
+            return None
+        key, prediction = self._result
+        if key != _prediction_key(createMode, points, point_labels):
+            return None
+        return prediction
+
+    def cancel(self):
+        """Drop the waiting request and the predictions of the running one."""
+        self._generation += 1
+        self._timer.stop()
+        self._requested = None
+        self._waiting = None
+        self._result = None
+
+    def isBusy(self):
+        return self._running or self._waiting is not None
+
+    def wait(self, msecs=-1):
+        return self._pool.waitForDone(msecs)
+
+    def _start(self):
+        if self._running or self._waiting is None:
+            return
+        model, key = self._waiting
+        self._waiting = None
+        self._running = True
+        task = AiPredictionTask(self._generation, model, key)
+        task.signals.finished.connect(self._onFinished)
+        self._pool.start(task)
+
+    def _onFinished(self, generation, key, prediction):
+        self._running = False
+        if generation == self._generation:
+            self._result = (key, prediction)
+            self.predicted.emit()
+        # the waiting request already waited for the running one
+        self._start()
+
+
+class EmbeddingPrefetchTask(QtCore.QRunnable):
+    def __init__(self, token, model, filename, imageDataOf, isCurrent):
+        super(EmbeddingPrefetchTask, self).__init__()
+        self.token = token
+        self.model = model
+        self.filename = filename
+        self.imageDataOf = imageDataOf
+        self.isCurrent = isCurrent
+
+    def run(self):
+        if not self.isCurrent(self.token):
+            return
+        QtCore.QThread.currentThread().setPriority(QtCore.QThread.LowestPriority)
+        try:
+            imageData = self.imageDataOf(self.filename)
+            image = QtGui.QImage.fromData(imageData) if imageData else None
+            if image is None or image.isNull():
+                return
+            if not self.isCurrent(self.token):
+                return
+            self.model.prefetch_image_embedding(model_input_image(image))
+        except Exception as e:
+            logger.warning(
+                "Failed to prefetch embedding of {}: {}".format(self.filename, e)
+            )
+
+
+class EmbeddingPrefetcher(QtCore.QObject):
+    """Compute the image embeddings of the files likely to be shown next.
+
+    Images are read with imageDataOf(filename), decoded and encoded by a
+    bounded pool of low priority threads. The embeddings go to the model's
+    embedding cache, so that set_image() is instant once a file is shown.
+    prefetch() drops the files of the previous call not started yet.
+    """
+
+    def __init__(self, imageDataOf, maxThreadCount=1, parent=None):
+        super(EmbeddingPrefetcher, self).__init__(parent)
+        self._imageDataOf = imageDataOf
+        self._token = 0
+
+        self._pool = QtCore.QThreadPool(self)
+        self._pool.setMaxThreadCount(maxThreadCount)
+
+    def prefetch(self, model, filenames):
+        """Prefetch the embeddings of filenames, in order."""
+        self.cancel()
+        for filename in filenames:
+            self._pool.start(
+                EmbeddingPrefetchTask(
+                    self._token, model, filename, self._imageDataOf, self.isCurrent
+                )
+            )
+
+    def cancel(self):
+        self._token += 1
+        self._pool.clear()
+
+    def isCurrent(self, token):
+        return token == self._token
+
+    def wait(self, msecs=-1):
+        return self._pool.waitForDone(msecs)
@@ -8,11 +8,9 @@ import os.path as osp
 import re
 import webbrowser
 import requests
-from pathlib import Path
 import threading
 
 import imgviz
-import natsort
 from qtpy import QtCore
 from qtpy import QtGui
 from qtpy import QtWidgets
@@ -21,14 +19,26 @@ from qtpy.QtCore import Qt
 from labelme import PY2
 from labelme import __appname__
 from labelme.ai import MODELS
+from labelme.ai_prediction import EmbeddingPrefetcher
 from labelme.config import get_config
+from labelme.file_search import search_predicate
+from labelme.file_watcher import DirectoryWatcher
 from labelme.label_file import LabelFile
 from labelme.label_file import LabelFileError
+from labelme.label_file import load_json
+from labelme.label_file import save_json
+from labelme.label_writer import LabelFileWriter
 from labelme.logger import logger
+from labelme.report_index import ReportIndex
+from labelme.scanner import case_index_from_path
+from labelme.scanner import path_sort_key
+from labelme.scanner import scan_directory
+from labelme.scanner import scan_images
 from labelme.shape import Shape
 from labelme.widgets import BrightnessContrastDialog
 from labelme.widgets import Canvas
 from labelme.widgets import FileDialogPreview
+from labelme.widgets import FileListWidget
 from labelme.widgets import LabelDialog
 from labelme.widgets import LabelListWidget
 from labelme.widgets import LabelListWidgetItem
@@ -40,7 +50,6 @@ from labelme.widgets import ZoomWidget
 from labelme.check import AnimatedDisplay
 
 from . import utils
-import json
 
 
 # FIXME
@@ -221,15 +230,11 @@ class MainWindow(QtWidgets.QMainWindow):
         self._copied_shapes = None
 
         # Main widgets and related state.
-        self.json_report = self.selectReportJson()
-        self.data_dict = {}
+        # case index -> report content, looked up lazily from an on-disk index
+        self.data_dict = self.selectReportJson()
+        if self.data_dict is None:
+            self.data_dict = {}
         self.tmp_dict = {}
-        for item in self.json_report:
-            k = item["ref_img"].replace("\\", "-")[1:]
-            v = item["content"]
-            self.data_dict[k] = v
-
-        del self.json_report
 
         self.labelDialog = LabelDialog(
             parent=self,
@@ -293,9 +298,22 @@ class MainWindow(QtWidgets.QMainWindow):
 
         self.fileSearch = QtWidgets.QLineEdit()
         self.fileSearch.setPlaceholderText(self.tr("Search Filename"))
-        self.fileSearch.textChanged.connect(self.fileSearchChanged)
-        self.fileListWidget = QtWidgets.QListWidget()
+        # search once typing pauses
+        self.fileSearchTimer = QtCore.QTimer(self)
+        self.fileSearchTimer.setSingleShot(True)
+        self.fileSearchTimer.setInterval(150)
+        self.fileSearchTimer.timeout.connect(self.fileSearchChanged)
+        self.fileSearch.textChanged.connect(lambda text: self.fileSearchTimer.start())
+        self.fileListWidget = FileListWidget(labelFileOf=self.getLabelFileOf)
         self.fileListWidget.itemSelectionChanged.connect(self.fileSelectionChanged)
+        # keeps the file list in sync with the opened directory
+        self.fileWatcher = DirectoryWatcher(parent=self)
+        self.fileWatcher.directoriesChanged.connect(self.fileDirectoriesChanged)
+
+        # label files are written in the background, see saveLabels
+        self.labelWriter = LabelFileWriter(parent=self)
+        self.labelWriter.saved.connect(self.labelFileSaved)
+        self.labelWriter.failed.connect(self.labelFileSaveFailed)
 
         fileListLayout = QtWidgets.QVBoxLayout()
         fileListLayout.setContentsMargins(0, 0, 0, 0)
@@ -317,11 +335,13 @@ class MainWindow(QtWidgets.QMainWindow):
         self.zoomWidget = ZoomWidget()
         self.setAcceptDrops(True)
 
+        embedding_cache = self._config["ai"]["embedding_cache"]
         self.canvas = self.labelList.canvas = Canvas(
             epsilon=self._config["epsilon"],
             double_click=self._config["canvas"]["double_click"],
             num_backups=self._config["canvas"]["num_backups"],
             crosshair=self._config["canvas"]["crosshair"],
+            embedding_cache_max_bytes=embedding_cache["max_bytes"],
         )
         self.canvas.zoomRequest.connect(self.zoomRequest)
 
@@ -338,6 +358,11 @@ class MainWindow(QtWidgets.QMainWindow):
         self.canvas.shapeMoved.connect(self.setDirty)
         self.canvas.selectionChanged.connect(self.shapeSelectionChanged)
         self.canvas.drawingPolygon.connect(self.toggleDrawingSensitive)
+        # embeddings of the neighbouring images are computed in the background
+        self.embeddingPrefetcher = EmbeddingPrefetcher(
+            imageDataOf=self.getImageDataOf, parent=self
+        )
+        self.canvas.aiModelInitialized.connect(self.prefetchEmbeddings)
 
         self.setCentralWidget(scrollArea)
 
@@ -1008,6 +1033,8 @@ class MainWindow(QtWidgets.QMainWindow):
             )
         self.output_file = output_file
         self.output_dir = output_dir
+        # names of the label files in output_dir, see recheckOutputDir
+        self._outputDirLabelFiles = frozenset()
 
         # Application state.
         self.image = QtGui.QImage()
@@ -1124,13 +1151,27 @@ class MainWindow(QtWidgets.QMainWindow):
 
     def loadReportJson(self):
         if self.report_json:
+            # only shown if building the index takes a while (first load)
+            progress = QtWidgets.QProgressDialog(
+                self.tr("Indexing report %s ...") % osp.basename(self.report_json),
+                None,
+                0,
+                1000,
+                self,
+            )
+            progress.setWindowModality(Qt.WindowModal)
+            progress.setMinimumDuration(500)
+
+            def updateProgress(done, total):
+                progress.setValue(int(1000 * done / max(total, 1)))
+
             try:
-                with open(self.report_json, "r") as file:
-                    data = json.load(file)
-                return data
+                return ReportIndex(self.report_json, progress=updateProgress)
             except Exception as e:
                 QtWidgets.QMessageBox.critical(self, "Error", str(e))
                 self.report_json = None
+            finally:
+                progress.close()
 
     def noShapes(self):
         return not len(self.labelList)
@@ -1162,7 +1203,6 @@ class MainWindow(QtWidgets.QMainWindow):
         if self._config["auto_save"] or self.actions.saveAuto.isChecked():
             # label_file = osp.splitext(self.imagePath)[0] + ".json"
             label_file = self.filename.replace(".png", ".json")
-            self.check_vis_update(os.path.dirname(label_file))
             if self.output_dir:
                 label_file_without_path = osp.basename(label_file)
                 label_file = osp.join(self.output_dir, label_file_without_path)
@@ -1379,26 +1419,19 @@ class MainWindow(QtWidgets.QMainWindow):
             self.uniqLabelList.setItemLabel(item, shape.label, rgb)
 
     def fileSearchChanged(self):
-        self.importDirImages(
-            self.lastOpenDir,
-            pattern=self.fileSearch.text(),
-            load=False,
-        )
+        self.fileSearchTimer.stop()
+        self.fileListWidget.setSearchPattern(self.fileSearch.text())
 
     def fileSelectionChanged(self):
-        items = self.fileListWidget.selectedItems()
-        if not items:
+        filenames = self.fileListWidget.selectedPaths()
+        if not filenames:
             return
-        item = items[0]
 
         if not self.mayContinue():
             return
 
-        currIndex = self.imageList.index(str(item.text()))
-        if currIndex < len(self.imageList):
-            filename = self.imageList[currIndex]
-            if filename:
-                self.loadFile(filename)
+        if filenames[0]:
+            self.loadFile(filenames[0])
 
     # React to canvas signals.
     def shapeSelectionChanged(self, selected_shapes):
@@ -1543,9 +1576,7 @@ class MainWindow(QtWidgets.QMainWindow):
 
     def check_vis_update(self, file_path: str):
         case_dir = os.path.dirname(file_path)
-        covt_seq = self.checkWindow.load_covt_seq(case_dir)
-        if covt_seq:
-            self.checkWindow.set_items(covt_seq)
+        self.checkWindow.request_update(case_dir)
 
     def saveLabels(self, filename):
         lf = LabelFile()
@@ -1575,28 +1606,30 @@ class MainWindow(QtWidgets.QMainWindow):
             imageData = self.imageData if self._config["store_data"] else None
             if osp.dirname(filename) and not osp.exists(osp.dirname(filename)):
                 os.makedirs(osp.dirname(filename))
-            lf.save(
-                filename=filename,
-                shapes=shapes,
-                imagePath=imagePath,
-                imageData=imageData,
-                imageHeight=self.image.height(),
-                imageWidth=self.image.width(),
-                otherData=self.otherData,
-                flags=flags,
+            # encoded and written atomically in the background, so that saving
+            # (e.g. autosave on next) does not block the UI
+            self.labelWriter.submit(
+                filename,
+                functools.partial(
+                    lf.save,
+                    filename=filename,
+                    shapes=shapes,
+                    imagePath=imagePath,
+                    imageData=imageData,
+                    imageHeight=self.image.height(),
+                    imageWidth=self.image.width(),
+                    otherData=self.otherData,
+                    flags=flags,
+                    imageDataStore=self._config["image_data_store"],
+                ),
             )
+            lf.filename = filename
             self.labelFile = lf
-            items = self.fileListWidget.findItems(self.imagePath, Qt.MatchExactly)
-            if len(items) > 0:
-                if len(items) != 1:
-                    raise RuntimeError("There are duplicate files.")
-                items[0].setCheckState(Qt.Checked)
+            self.fileListWidget.setCheckState(self.imagePath, Qt.Checked)
             # disable allows next and previous image to proceed
             # self.filename = filename
-
-            self.check_vis_update(filename)
             return True
-        except LabelFileError as e:
+        except (LabelFileError, OSError) as e:
             self.errorMessage(
                 self.tr("Error saving label data"), self.tr("<b>%s</b>") % e
             )
@@ -1781,10 +1814,9 @@ class MainWindow(QtWidgets.QMainWindow):
     def loadFile(self, filename=None):
         """Load the specified file, or the last opened file if None."""
         # changing fileListWidget loads file
-        if filename in self.imageList and (
-            self.fileListWidget.currentRow() != self.imageList.index(filename)
-        ):
-            self.fileListWidget.setCurrentRow(self.imageList.index(filename))
+        row = self.fileListWidget.row(filename)
+        if row >= 0 and self.fileListWidget.currentRow() != row:
+            self.fileListWidget.setCurrentRow(row)
             self.fileListWidget.repaint()
             return
 
@@ -1803,11 +1835,9 @@ class MainWindow(QtWidgets.QMainWindow):
             return False
         # assumes same name, but json extension
         self.status(str(self.tr("Loading %s...")) % osp.basename(str(filename)))
-        label_file = osp.splitext(filename)[0] + ".json"
-
-        if self.output_dir:
-            label_file_without_path = osp.basename(label_file)
-            label_file = osp.join(self.output_dir, label_file_without_path)
+        label_file = self.getLabelFileOf(filename)
+        # the label file may still be being written
+        self.labelWriter.wait(label_file)
         if QtCore.QFile.exists(label_file) and LabelFile.is_label_file(label_file):
             try:
                 self.labelFile = LabelFile(label_file)
@@ -1868,12 +1898,7 @@ class MainWindow(QtWidgets.QMainWindow):
             sentences = [sentence.strip() for sentence in sentences if sentence.strip()]
             return sentences
 
-        path = Path(self.filename)
-        patient_id, case_id, _ = path.parts[-3:]
-        if "-" in case_id:
-            self.ref_index = case_id[:3] + "-" + case_id
-        else:
-            self.ref_index = patient_id[:3] + "-" + patient_id + "-" + case_id
+        self.ref_index = case_index_from_path(self.filename)
         content = self.data_dict[self.ref_index]
         flags = {k: False for k in split_into_sentences(content)}
 
@@ -1937,6 +1962,7 @@ class MainWindow(QtWidgets.QMainWindow):
         self.addRecentFile(self.filename)
         self.toggleActions(True)
         self.canvas.setFocus()
+        self.prefetchEmbeddings()
         self.status(str(self.tr("Loaded %s")) % osp.basename(str(filename)))
         return True
 
@@ -2039,15 +2065,15 @@ class MainWindow(QtWidgets.QMainWindow):
         if not self.mayContinue():
             return
 
-        if len(self.imageList) <= 0:
+        if len(self.fileListWidget) <= 0:
             return
 
         if self.filename is None:
             return
 
-        currIndex = self.imageList.index(self.filename)
+        currIndex = self.fileListWidget.row(self.filename)
         if currIndex - 1 >= 0:
-            filename = self.imageList[currIndex - 1]
+            filename = self.fileListWidget.path(currIndex - 1)
             if filename:
                 self.loadFile(filename)
 
@@ -2063,18 +2089,18 @@ class MainWindow(QtWidgets.QMainWindow):
         if not self.mayContinue():
             return
 
-        if len(self.imageList) <= 0:
+        if len(self.fileListWidget) <= 0:
             return
 
         filename = None
         if self.filename is None:
-            filename = self.imageList[0]
+            filename = self.fileListWidget.path(0)
         else:
-            currIndex = self.imageList.index(self.filename)
-            if currIndex + 1 < len(self.imageList):
-                filename = self.imageList[currIndex + 1]
+            currIndex = self.fileListWidget.row(self.filename)
+            if currIndex + 1 < len(self.fileListWidget):
+                filename = self.fileListWidget.path(currIndex + 1)
             else:
-                filename = self.imageList[-1]
+                filename = self.fileListWidget.path(len(self.fileListWidget) - 1)
         self.filename = filename
 
         if self.filename and load:
@@ -2125,6 +2151,7 @@ class MainWindow(QtWidgets.QMainWindow):
         if not output_dir:
             return
 
+        previousOutputDir = self.output_dir
         self.output_dir = output_dir
 
         self.statusBar().showMessage(
@@ -2133,13 +2160,19 @@ class MainWindow(QtWidgets.QMainWindow):
         )
         self.statusBar().show()
 
-        current_filename = self.filename
-        self.importDirImages(self.lastOpenDir, load=False)
-
-        if current_filename in self.imageList:
-            # retain currently selected file
-            self.fileListWidget.setCurrentRow(self.imageList.index(current_filename))
-            self.fileListWidget.repaint()
+        # the label files to check moved, the list itself is unchanged
+        self.fileListWidget.model().invalidateCheckStates()
+        if self.lastOpenDir:
+            if previousOutputDir:
+                previousOutputDir = osp.normpath(previousOutputDir)
+                openDir = osp.normpath(self.lastOpenDir)
+                # unless it is also watched as one of the image directories
+                if previousOutputDir != openDir and not previousOutputDir.startswith(
+                    openDir + os.sep
+                ):
+                    self.fileWatcher.removeDirectories([previousOutputDir])
+            self._outputDirLabelFiles = self.listOutputDirLabelFiles()
+            self.fileWatcher.addDirectories([osp.normpath(self.output_dir)])
 
     def saveFile(self, _value=False):
         assert not self.image.isNull(), "cannot save empty image"
@@ -2201,18 +2234,41 @@ class MainWindow(QtWidgets.QMainWindow):
                 for file in files
                 if file.endswith(".json") and file != os.path.basename(filename)
             ]
+            flags = split_sentences(self.tmp_dict[self.ref_index])
             for file in matching_files:
                 other_view_json_path = os.path.join(directory, file)
-                with open(other_view_json_path, "r", encoding="utf-8") as f:
-                    json_data = json.load(f)
-                json_data["flags"] = split_sentences(self.tmp_dict[self.ref_index])
-                with open(other_view_json_path, "w") as f:
-                    json.dump(json_data, f, indent=2)
+                self.labelWriter.submit(
+                    other_view_json_path,
+                    functools.partial(
+                        self._saveLabelFileFlags, other_view_json_path, flags
+                    ),
+                    replace=False,
+                )
 
         if filename and self.saveLabels(filename):
             self.addRecentFile(filename)
             self.setClean()
 
+    @staticmethod
+    def _saveLabelFileFlags(filename, flags):
+        json_data = load_json(filename)
+        json_data["flags"] = flags
+        save_json(filename, json_data)
+
+    def labelFileSaved(self, filename):
+        self.check_vis_update(filename)
+
+    def labelFileSaveFailed(self, filename, error):
+        if self.labelFile and self.labelFile.filename == filename:
+            # the annotations shown are not saved, not calling setDirty as it
+            # would autosave again
+            self.dirty = True
+            self.actions.save.setEnabled(True)
+        self.errorMessage(
+            self.tr("Error saving label data"),
+            self.tr("<b>%s</b>: %s") % (filename, error),
+        )
+
     def closeFile(self, _value=False):
         if not self.mayContinue():
             return
@@ -2239,12 +2295,12 @@ class MainWindow(QtWidgets.QMainWindow):
             return
 
         label_file = self.getLabelFile()
+        self.labelWriter.wait(label_file)
         if osp.exists(label_file):
             os.remove(label_file)
             logger.info("Label file is removed: {}".format(label_file))
 
-            item = self.fileListWidget.currentItem()
-            item.setCheckState(Qt.Unchecked)
+            self.fileListWidget.setCheckState(self.filename, Qt.Unchecked)
 
             self.resetState()
 
@@ -2353,13 +2409,32 @@ class MainWindow(QtWidgets.QMainWindow):
         )
         self.importDirImages(targetDirPath)
 
-    @property
-    def imageList(self):
-        lst = []
-        for i in range(self.fileListWidget.count()):
-            item = self.fileListWidget.item(i)
-            lst.append(item.text())
-        return lst
+    def getLabelFileOf(self, filename):
+        return LabelFile.get_label_file(filename, self.output_dir)
+
+    def getImageDataOf(self, filename):
+        """Return the image data loadFile would show for filename."""
+        return LabelFile.load_shown_image_data(filename, self.output_dir)
+
+    def prefetchEmbeddings(self):
+        """Prefetch the AI embeddings of the files around the current one."""
+        model = self.canvas.aiModel()
+        count = self._config["ai"]["prefetch"]
+        row = self.fileListWidget.row(self.filename) if self.filename else -1
+        if model is None or not count or row < 0:
+            self.embeddingPrefetcher.cancel()
+            return
+        rows = []
+        for i in range(1, count + 1):
+            rows += [row + i, row - i]
+        self.embeddingPrefetcher.prefetch(
+            model,
+            [
+                self.fileListWidget.path(r)
+                for r in rows
+                if 0 <= r < len(self.fileListWidget)
+            ],
+        )
 
     def importDroppedImageFiles(self, imageFiles):
         extensions = [
@@ -2368,22 +2443,11 @@ class MainWindow(QtWidgets.QMainWindow):
         ]
 
         self.filename = None
-        for file in imageFiles:
-            if file in self.imageList or not file.lower().endswith(tuple(extensions)):
-                continue
-            label_file = osp.splitext(file)[0] + ".json"
-            if self.output_dir:
-                label_file_without_path = osp.basename(label_file)
-                label_file = osp.join(self.output_dir, label_file_without_path)
-            item = QtWidgets.QListWidgetItem(file)
-            item.setFlags(Qt.ItemIsEnabled | Qt.ItemIsSelectable)
-            if QtCore.QFile.exists(label_file) and LabelFile.is_label_file(label_file):
-                item.setCheckState(Qt.Checked)
-            else:
-                item.setCheckState(Qt.Unchecked)
-            self.fileListWidget.addItem(item)
+        self.fileListWidget.addPaths(
+            [file for file in imageFiles if file.lower().endswith(tuple(extensions))]
+        )
 
-        if len(self.imageList) > 1:
+        if len(self.fileListWidget) > 1:
             self.actions.openNextImg.setEnabled(True)
             self.actions.openPrevImg.setEnabled(True)
 
@@ -2399,51 +2463,109 @@ class MainWindow(QtWidgets.QMainWindow):
         self.lastOpenDir = dirpath
         self.filename = None
         self.fileListWidget.clear()
+        self.fileWatcher.clear()
 
-        filenames = self.scanAllImages(dirpath)
-        if pattern:
-            try:
-                filenames = [f for f in filenames if re.search(pattern, f)]
-            except re.error:
-                pass
-        for filename in filenames:
-            label_file = osp.splitext(filename)[0] + ".json"
-            if self.output_dir:
-                label_file_without_path = osp.basename(label_file)
-                label_file = osp.join(self.output_dir, label_file_without_path)
-            item = QtWidgets.QListWidgetItem(filename)
-            item.setFlags(Qt.ItemIsEnabled | Qt.ItemIsSelectable)
-            if QtCore.QFile.exists(label_file) and LabelFile.is_label_file(label_file):
-                item.setCheckState(Qt.Checked)
-            else:
-                item.setCheckState(Qt.Unchecked)
-            self.fileListWidget.addItem(item)
+        self.fileListWidget.setFilter(search_predicate(pattern))
+        dirs = []
+        self.fileListWidget.setPaths(self.scanAllImages(dirpath, dirs=dirs))
+        if self.output_dir:
+            self._outputDirLabelFiles = self.listOutputDirLabelFiles()
+            dirs.append(osp.normpath(self.output_dir))
+        self.fileWatcher.setDirectories(dirs)
         self.openNextImg(load=load)
 
-    def scanAllImages(self, folderPath):
-        extensions = [
+    def fileDirectoriesChanged(self, dirs):
+        model = self.fileListWidget.model()
+        extensions = self.imageExtensions()
+        for dirpath in dirs:
+            if self.output_dir and dirpath == osp.normpath(self.output_dir):
+                self.recheckOutputDir()
+
+            if not osp.isdir(dirpath):
+                self.removeFileDirectory(dirpath)
+                continue
+
+            images, subDirs = scan_directory(
+                dirpath, extensions, case_filter=self.data_dict.__contains__
+            )
+            known = model.pathsInDir(dirpath)
+            added = [p for p in images if p not in known]
+            removed = known.difference(images)
+
+            newDirs = []
+            for subDir in subDirs:
+                if subDir not in self.fileWatcher:
+                    added.extend(self.scanAllImages(subDir, dirs=newDirs))
+            for subDir in self.fileWatcher.directories():
+                if osp.dirname(subDir) == dirpath and not osp.isdir(subDir):
+                    self.removeFileDirectory(subDir)
+
+            model.removePaths(removed)
+            model.insertPaths(added, key=path_sort_key)
+            self.fileWatcher.addDirectories(newDirs)
+            # label files may have been added or removed
+            model.recheckPaths(images)
+
+    def listOutputDirLabelFiles(self):
+        try:
+            with os.scandir(self.output_dir) as it:
+                return frozenset(
+                    osp.normcase(entry.name)
+                    for entry in it
+                    if entry.name.endswith(LabelFile.suffix)
+                )
+        except OSError:
+            return frozenset()
+
+    def recheckOutputDir(self):
+        """Recheck the images whose label file was added to or removed from
+        output_dir. Overwriting label files, e.g. saving, rechecks nothing."""
+        names = self.listOutputDirLabelFiles()
+        changed = names.symmetric_difference(self._outputDirLabelFiles)
+        self._outputDirLabelFiles = names
+        model = self.fileListWidget.model()
+        paths = []
+        for name in changed:
+            paths.extend(model.pathsWithStem(osp.splitext(name)[0]))
+        model.recheckPaths(paths)
+
+    def removeFileDirectory(self, dirpath):
+        model = self.fileListWidget.model()
+        prefix = dirpath + os.sep
+        model.removePaths(
+            [
+                path
+                for d in list(model.dirs())
+                if d == dirpath or d.startswith(prefix)
+                for path in model.pathsInDir(d)
+            ]
+        )
+        self.fileWatcher.removeDirectories(
+            [
+                d
+                for d in self.fileWatcher.directories()
+                if d == dirpath or d.startswith(prefix)
+            ]
+        )
+
+    def imageExtensions(self):
+        return [
             ".%s" % fmt.data().decode().lower()
             for fmt in QtGui.QImageReader.supportedImageFormats()
         ]
 
-        images = []
-        for root, _, files in os.walk(folderPath):
-            for file in files:
-                if file.lower().endswith(tuple(extensions)):
-                    relativePath = os.path.normpath(osp.join(root, file))
-                    normalized_path = os.path.normpath(relativePath)
-                    parts = normalized_path.split(os.sep)
-                    if "-" in parts[-2]:
-                        case_index = parts[-2][:3] + "-" + parts[-2]
-                    else:
-                        case_index = parts[-3][:3] + "-" + parts[-3] + "-" + parts[-2]
-                    if case_index not in self.data_dict.keys():
-                        break
-                    images.append(relativePath)
-        images = natsort.os_sorted(images)
-        return images
+    def scanAllImages(self, folderPath, dirs=None):
+        return scan_images(
+            folderPath,
+            self.imageExtensions(),
+            case_filter=self.data_dict.__contains__,
+            workers=self._config["scan_workers"],
+            dirs=dirs,
+        )
 
     def closeEvent(self, event):
+        self.embeddingPrefetcher.cancel()
+        self.labelWriter.flush()
         # Override close event to notify server of shutdown
         _ = requests.post(self.server_url + "shutdown/", data={"uuid": str(self.uuid)})
         event.accept()
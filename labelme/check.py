@@ -1,16 +1,16 @@
 from PyQt5.QtWidgets import (QApplication, QWidget, QVBoxLayout, QLabel, QScrollArea, QMainWindow, QFrame, QTextEdit, QFileDialog, QPushButton)
 from PyQt5.QtGui import QPixmap, QImage, QTextCharFormat, QFont, QColor
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QObject, QRunnable, QThreadPool, pyqtSignal
 from PIL import Image, ImageDraw
 import sys
 import random
-import json
 import base64
 from io import BytesIO
-import copy
 import numpy as np
 import os
 from .label_config import cls2type
+from . import object_store
+from .label_file import load_json
 
 def convert_nested_to_int(nested_list):
     """递归将嵌套列表中的所有元素转换为整数"""
@@ -27,14 +27,23 @@ def flatten(lst):
     return [item for sublist in lst for item in sublist]
 
 
+# 检查窗口中预览图像的最大尺寸
+PREVIEW_SIZE = (512, 512)
+
+
+def fit_size(size, max_width: int, max_height: int):
+    """计算保持宽高比缩放到最大尺寸以内后的大小"""
+    # 计算缩放比例以适应最大尺寸
+    ratio = min(max_width / size[0], max_height / size[1])
+    return (int(size[0] * ratio), (int(size[1] * ratio)))
+
+
 def resize_image(image: Image.Image, max_width: int, max_height: int):
     """
     Resize the image to fit within the specified dimensions, maintaining aspect ratio.
     Keeps lines and points intact by resizing through nearest neighbor interpolation, followed by Lanczos.
     """
-    # 计算缩放比例以适应最大尺寸
-    ratio = min(max_width / image.width, max_height / image.height)
-    new_size = (int(image.width * ratio), (int(image.height * ratio)))
+    new_size = fit_size(image.size, max_width, max_height)
 
     # 使用最近邻缩放
     nearest_resized = image.resize(new_size, Image.NEAREST)
@@ -44,6 +53,12 @@ def resize_image(image: Image.Image, max_width: int, max_height: int):
 
     return lanczos_resized
 
+
+def preview_image(image: Image.Image, max_width: int, max_height: int):
+    """缩放原图用于预览, JPEG在解码时就直接缩小(draft), 不需要解码完整分辨率"""
+    image.draft(image.mode, fit_size(image.size, max_width, max_height))
+    return resize_image(image, max_width, max_height)
+
 def clean_sentence(sentence):
     # 指定要删除的字符
     characters_to_remove = "\t\n ."
@@ -68,6 +83,443 @@ def remove_duplicates(lst):
             result.append(item)
     return result
 
+def load_covt_case(json_dir_path, decode_images=True):
+    """
+    读取病例目录下所有视图的json, 每个文件只解析一次, imageData也只解码一次。
+    不是标注文件的json会被跳过, 没有标注文件时返回None。
+
+    decode_images为False时不解码图像(image为None), 只用于检查标注。
+    """
+    json_file_list = [
+        file_name
+        for file_name in os.listdir(json_dir_path)
+        if file_name.endswith('.json')
+    ]
+    if len(json_file_list) == 0:
+        return None
+
+    case = []
+    for json_file_name in json_file_list:
+        json_file_path = os.path.join(json_dir_path, json_file_name)
+        json_data = load_json(json_file_path)
+        if not isinstance(json_data, dict) or 'shapes' not in json_data:
+            # 不是标注文件(例如report.json), 跳过
+            continue
+
+        image = None
+        image_key = None
+        if json_data['imageData'] is not None:
+            if decode_images:
+                image = Image.open(BytesIO(base64.b64decode(json_data['imageData'])))
+            image_key = hash(json_data['imageData'])
+        elif json_data.get('imageDataRef'):
+            # 图像保存在旁路对象存储中, json里只有sha256
+            if decode_images:
+                image_data = object_store.read_object(
+                    object_store.get_objects_dir(json_file_path),
+                    json_data['imageDataRef'],
+                )
+                image = Image.open(BytesIO(image_data))
+            image_key = json_data['imageDataRef']
+
+        shapes = []
+        for shape in json_data['shapes']:
+            shapes.append(dict(
+                label=shape['label'],
+                points=shape['points'],
+                shape_type=shape['shape_type'],
+                description=shape.get('description'),
+                flags={clean_sentence(k): v for k, v in shape['flags'].items()},
+            ))
+
+        case.append(dict(
+            name=json_file_name,
+            image=image,
+            image_key=image_key,
+            size=(json_data['imageWidth'], json_data['imageHeight']),
+            flags=[clean_sentence(flag) for flag in json_data['flags']],
+            shapes=shapes,
+        ))
+    if len(case) == 0:
+        return None
+    return case
+
+
+def draw_shape(draw, shape_type, points, scale=(1.0, 1.0)):
+    """在画布上绘制形状, scale为坐标的缩放比例, 线宽和点的半径随之缩放"""
+    sx, sy = scale
+    if scale != (1.0, 1.0):
+        points = [[x * sx, y * sy] for x, y in points]
+    s = (sx + sy) / 2
+    if shape_type == 'polygon':
+        points = [tuple(point) for point in points]
+        draw.polygon(points, fill=255)
+    elif shape_type in ['linestrip', 'line']:
+        for i in range(len(points) - 1):
+            draw.line(points[i] + points[i + 1], fill=255, width=max(1, round(13 * s)))
+    elif shape_type == 'point':
+        for point in points:
+            x, y = point
+            r = 15 * s
+            draw.ellipse([(x - r, y - r), (x + r, y + r)], fill=255)
+    elif shape_type == 'rectangle':
+        points = convert_nested_to_int(points)
+        points = flatten(points)
+        draw.rectangle(points, fill=255)
+
+
+def collect_covt_flags(case):
+    """返回(原报告语句, 需要生成序列的报告语句)"""
+    flags = list()
+    for view in case:
+        if view['image_key'] is None:
+            continue
+        flags.extend(view['flags'])
+    report_flags = remove_duplicates(flags)
+
+    flags = report_flags[:1]
+    for view in case:
+        for shape in view['shapes']:
+            for k, v in shape['flags'].items():
+                if v and k not in flags:
+                    flags.append(k)
+    return report_flags, flags
+
+
+def validate_covt_case(case, log_content):
+    """检查病例中的标注, 问题追加到log_content, 返回每个视图中可以绘制的形状"""
+    report_flags, flags = collect_covt_flags(case)
+
+    for view in case:
+        if view['image_key'] is None:
+            log_content.append(f"{view['name']}的imageData属性为空")
+
+    for ref_flag in report_flags:
+        if ref_flag not in flags:
+            log_content.append(
+                f"原报告 {ref_flag}未标注，如果是正常修改报告引起的请忽略"
+            )
+
+    view_shapes = []
+    for view in case:
+        shapes = []
+        for shape in view['shapes']:
+            label = shape['label']
+            shape_type = shape['shape_type']
+            if label not in cls2type.keys():
+                log_content.append(f"出现了未知标签:{label}")
+                continue
+            if cls2type[label] != shape_type:
+                log_content.append(
+                    f"{label}的标注类别为{shape_type}, 与期望的{cls2type[label]}不匹配"
+                )
+            # 只有属于某条报告语句的形状才会被绘制
+            if not any(shape['flags'].values()):
+                continue
+            if shape['description'] is None:
+                log_content.append(f"{label}的description为空,请补上")
+                continue
+            if len(shape['points']) <= 1 and shape_type != 'point':
+                log_content.append(f"{label}不是点标签，但是所获取的坐标点却只有一个")
+                continue
+            shapes.append(shape)
+        view_shapes.append(shapes)
+    return view_shapes
+
+
+def shape_signature(shape):
+    points = tuple(tuple(point) for point in shape['points'])
+    return shape['label'], shape['shape_type'], shape['description'], points
+
+
+def covt_row_keys(case):
+    """
+    为序列的每一行生成一个key, key相同的行绘制结果相同, 可以直接复用。
+
+    第一行为原图, 之后每条报告语句一行, 由原图和属于该语句的形状决定。
+    """
+    _, flags = collect_covt_flags(case)
+    image_keys = tuple((view['name'], view['image_key']) for view in case)
+    keys = [image_keys]
+    for flag in flags:
+        view_keys = tuple(
+            tuple(
+                shape_signature(shape)
+                for shape in view['shapes']
+                if shape['flags'].get(flag)
+            )
+            for view in case
+        )
+        keys.append((flag, image_keys, view_keys))
+    return keys
+
+
+def build_covt_seq(case, log_content, skip_rows=(), max_size=None):
+    """
+    由load_covt_case得到的病例生成每条报告语句的标注序列,
+    检查出的问题追加到log_content。
+
+    每一步的标注为一张bool掩码, 只有显示时才转换为图像(mask_to_image)。
+    skip_rows中的行(第一行原图除外)不绘制, 在序列中以None占位。
+    max_size为None时按原图分辨率绘制, 否则原图缩放到max_size以内, 形状的坐标按相同比例
+    缩放后直接绘制在预览尺寸的画布上。
+    """
+    covt_seq = []
+    org_img_list = []
+
+    canvas_sizes = []
+    for view in case:
+        image = view['image']
+        if max_size is None:
+            canvas_sizes.append(view['size'])
+        elif image is not None:
+            image = preview_image(image, *max_size)
+            canvas_sizes.append(image.size)
+        else:
+            canvas_sizes.append(fit_size(view['size'], *max_size))
+        if image is None:
+            continue
+        org_img_list.append([image])
+
+    org_img_list.append("Original chest x-ray images obtained")
+    covt_seq.append(org_img_list)
+
+    _, flags = collect_covt_flags(case)
+    view_shapes = validate_covt_case(case, log_content)
+
+    # 每个视图一块可复用的画布, 形状逐个绘制后按包围框合并到当前步骤的掩码中
+    scratches = [Image.new('L', size, 0) for size in canvas_sizes]
+
+    for r_idx, flag in enumerate(flags, start=1):
+        if r_idx in skip_rows:
+            covt_seq.append(None)
+            continue
+        single_report_seq = []
+
+        for view, shapes, size, scratch in zip(
+            case, view_shapes, canvas_sizes, scratches
+        ):
+            single_view_seq = []
+            scale = (size[0] / view['size'][0], size[1] / view['size'][1])
+            draw = ImageDraw.Draw(scratch)
+            for shape in shapes:
+                if not shape['flags'].get(flag):
+                    continue
+
+                last_txt = single_view_seq[-1] if len(single_view_seq) > 0 else None
+
+                points = shape['points']
+                shape_type = shape['shape_type']
+                description = shape['description']
+
+                if description.endswith('.') or description.endswith('\n'):
+                    description = description[:-1]
+
+                try:
+                    draw_shape(draw, shape_type, points, scale)
+                except Exception as e:
+                    clear_scratch(scratch)
+                    log_content.append("请检查一下报错:\n" + str(e))
+                    continue
+
+                # 描述相同的连续形状合并为同一步
+                if description == last_txt:
+                    mask = single_view_seq[-2]
+                else:
+                    mask = np.zeros((size[1], size[0]), dtype=bool)
+                    single_view_seq.extend([mask, description])
+                merge_scratch(scratch, mask)
+            single_report_seq.append(single_view_seq)
+        single_report_seq.append(f"Findings: {flag}")
+
+        covt_seq.append(single_report_seq)
+    return covt_seq
+
+
+def clear_scratch(scratch):
+    bbox = scratch.getbbox()
+    if bbox is not None:
+        scratch.paste(0, bbox)
+
+
+def merge_scratch(scratch, mask):
+    """将画布上绘制的内容合并到掩码中, 只复制包围框内的像素, 然后清空画布"""
+    bbox = scratch.getbbox()
+    if bbox is None:
+        return
+    x0, y0, x1, y1 = bbox
+    region = mask[y0:y1, x0:x1]
+    np.logical_or(region, np.asarray(scratch.crop(bbox)), out=region)
+    scratch.paste(0, bbox)
+
+
+def mask_to_image(mask):
+    """需要显示或缩放时才把掩码转换为PIL图像"""
+    return Image.fromarray(mask.view(np.uint8) * np.uint8(255))
+
+
+def resize_covt_seq(covt_seq):
+    """将序列中的所有图像缩放到预览尺寸"""
+    items = []
+    for item in covt_seq:
+        if item is None:
+            items.append(None)
+            continue
+        assert isinstance(item, list)
+        new_item = []
+        for views in item:
+            new_views = []
+            if isinstance(views, list):
+                for step in views:
+                    if isinstance(step, np.ndarray):
+                        step = resize_image(mask_to_image(step), *PREVIEW_SIZE)
+                        step = np.asarray(step) > 250
+                    elif isinstance(step, Image.Image):
+                        step = resize_image(step, *PREVIEW_SIZE)
+                    new_views.append(step)
+            else:
+                new_views = views
+            new_item.append(new_views)
+        items.append(new_item)
+    return items
+
+
+class MaskCompositor(object):
+    """
+    每个视图保留一块预分配的RGBA uint8缓冲区, 每一步的掩码直接在缓冲区上叠加颜色。
+
+    叠加只访问掩码内的像素, 使用整数运算: new = old * 7 // 10 + color * 3 // 10。
+    """
+
+    def __init__(self, base_img):
+        self.base = np.ascontiguousarray(np.asarray(base_img.convert("RGBA")))
+        self.buffer = np.empty_like(self.base)
+        self.reset()
+
+    def reset(self):
+        """回到原图, 开始新的一行"""
+        np.copyto(self.buffer, self.base)
+
+    def blend(self, mask, color):
+        pixels = self.buffer.reshape(-1, 4)
+        index = np.flatnonzero(mask)
+        selected = pixels[index].astype(np.uint16)
+        selected *= 7
+        selected //= 10
+        selected += np.uint16(color) * 3 // 10
+        pixels[index] = selected
+
+    def to_qimage(self):
+        """返回直接引用缓冲区的QImage, 缓冲区在下一次blend时会被修改"""
+        height, width = self.buffer.shape[:2]
+        return QImage(
+            self.buffer.data, width, height, width * 4, QImage.Format_RGBA8888
+        )
+
+
+def pil_to_qimage(img):
+    array = np.ascontiguousarray(np.asarray(img.convert("RGBA")))
+    height, width = array.shape[:2]
+    return QImage(array.data, width, height, width * 4, QImage.Format_RGBA8888).copy()
+
+
+def render_covt_rows(covt_seq, is_cancelled=None, skip_rows=()):
+    """
+    合成检查序列每一步的显示图像, 不创建任何控件, 可以在后台线程中调用。
+
+    :param covt_seq: 预览尺寸的build_covt_seq结果,
+        原分辨率的序列需要先经过resize_covt_seq
+    :param is_cancelled: 可选的回调, 返回True时放弃合成并返回None
+    :param skip_rows: 不需要合成的行, 结果中以None占位
+    :return: 每条报告语句一行, 每行为(文本或QImage, 是否为报告语句)的列表
+    """
+    items = covt_seq
+    compositors = [MaskCompositor(items[0][0][0])]
+    if len(items[0]) > 2:
+        compositors.append(MaskCompositor(items[0][1][0]))
+    else:
+        compositors.append(None)
+
+    rows = []
+    for r_idx, single_report_inference in enumerate(items):
+        if is_cancelled is not None and is_cancelled():
+            return None
+        if r_idx in skip_rows or single_report_inference is None:
+            rows.append(None)
+            continue
+        row = []
+        for view_idx, single_view_inference in enumerate(single_report_inference):
+            if isinstance(single_view_inference, str):
+                row.append((single_view_inference, True))
+                continue
+            assert isinstance(single_view_inference, list)
+            # 第一行为原图, 其余行在对应视图的原图上逐步叠加掩码
+            if r_idx == 0:
+                compositor = None
+            else:
+                compositor = compositors[0] if view_idx == 0 else compositors[1]
+            if compositor is not None:
+                compositor.reset()
+            for step in single_view_inference:
+                if isinstance(step, str):
+                    row.append((step, False))
+                    continue
+                if compositor is None:
+                    if isinstance(step, np.ndarray):
+                        step = mask_to_image(step)
+                    row.append((pil_to_qimage(step), False))
+                    continue
+                # 随机生成颜色, 保持Alpha值为128
+                random_color = [random.randint(0, 255) for _ in range(3)] + [128]
+                compositor.blend(step, random_color)
+                # 缓冲区会继续用于下一步, 每一步显示的图像需要各自保留一份
+                row.append((compositor.to_qimage().copy(), False))
+        rows.append(row)
+    return rows
+
+
+class CovtRenderSignals(QObject):
+    finished = pyqtSignal(int, object, object, object)
+
+
+class CovtRenderTask(QRunnable):
+    """在后台线程中读取病例目录并合成检查序列, 结果通过signals.finished发回界面线程"""
+
+    def __init__(self, token, json_dir_path, is_current, known_keys=()):
+        super(CovtRenderTask, self).__init__()
+        self.token = token
+        self.json_dir_path = json_dir_path
+        self.is_current = is_current
+        # 界面上已经显示的行, 这些行只需要复用, 不再重新绘制
+        self.known_keys = frozenset(known_keys)
+        self.signals = CovtRenderSignals()
+
+    def is_cancelled(self):
+        return not self.is_current(self.token)
+
+    def run(self):
+        log_content = []
+        keys = None
+        try:
+            case = load_covt_case(self.json_dir_path)
+            if case is None or self.is_cancelled():
+                return
+            keys = covt_row_keys(case)
+            skip_rows = {
+                r_idx for r_idx, key in enumerate(keys) if key in self.known_keys
+            }
+            covt_seq = build_covt_seq(case, log_content, skip_rows, PREVIEW_SIZE)
+            if self.is_cancelled():
+                return
+            rows = render_covt_rows(covt_seq, self.is_cancelled, skip_rows)
+            if rows is None:
+                return
+        except Exception as e:
+            log_content.append("请检查一下报错:\n" + str(e))
+            rows = None
+        self.signals.finished.emit(self.token, keys, rows, log_content)
+
+
 class AnimatedDisplay(QWidget):
     def __init__(self, items=None, *args, **kwargs):
         super(AnimatedDisplay, self).__init__(*args, **kwargs)
@@ -88,7 +540,6 @@ class AnimatedDisplay(QWidget):
         
         self.current_text_label = None
         self.current_image_label = None
-        self.current_image = None
 
         # Warning log display
         self.warning_log_display = QTextEdit()
@@ -101,28 +552,32 @@ class AnimatedDisplay(QWidget):
         # self.folder_button.clicked.connect(self.select_folder)
         # self.layout.addWidget(self.folder_button)
 
-        if items is not None:
-            self.set_items(items)
-
-        self.current_index = 0
-        self.items = []
-        self.hist_imgs = []
         self.log_content = []
         self.original_pixmaps = {}
+        # key -> (行控件, 行内的图像QLabel), 保存后只重建发生变化的行
+        self.row_widgets = {}
+        self.row_keys = []
+
+        # 后台合成检查序列, 新的请求会使旧的请求失效
+        self._render_pool = QThreadPool(self)
+        self._render_pool.setMaxThreadCount(1)
+        self._render_token = 0
+
+        if items is not None:
+            self.set_items(items)
 
     def resizeEvent(self, event):
         """Override the resize event to resize images when the window is resized."""
-        super().resizeEvent(event)
+        if event is not None:
+            super().resizeEvent(event)
         self.resize_images()
 
     def resize_images(self):
         """Resize images based on the current window size."""
-        for i in range(self.scroll_area_layout.count()):
-            widget = self.scroll_area_layout.itemAt(i).widget()
-            if isinstance(widget, QLabel) and widget.pixmap():
-                original_pixmap = self.original_pixmaps.get(widget)
-                if original_pixmap:
-                    widget.setPixmap(original_pixmap.scaled(self.scroll_area.size(), Qt.KeepAspectRatio)) 
+        for widget, original_pixmap in self.original_pixmaps.items():
+            widget.setPixmap(
+                original_pixmap.scaled(self.scroll_area.size(), Qt.KeepAspectRatio)
+            )
 
 
     def clear_layout(self, layout):
@@ -131,61 +586,84 @@ class AnimatedDisplay(QWidget):
             child = layout.takeAt(0)
             if child.widget():
                 child.widget().deleteLater()
+        self.original_pixmaps = {}
+        self.row_widgets = {}
+        self.row_keys = []
+        # 进行中的请求会复用刚删除的行, 使其失效
+        self._render_token += 1
+
+    def request_update(self, json_dir_path):
+        """在后台线程中重新生成json_dir_path的检查序列, 之前未完成的请求会被取消"""
+        self._render_token += 1
+        self._render_pool.clear()
+        task = CovtRenderTask(
+            self._render_token,
+            json_dir_path,
+            self.is_current_request,
+            self.row_widgets.keys(),
+        )
+        task.signals.finished.connect(self._on_render_finished)
+        self._render_pool.start(task)
+
+    def is_current_request(self, token):
+        return token == self._render_token
+
+    def _on_render_finished(self, token, keys, rows, log_content):
+        if not self.is_current_request(token):
+            return
+        self.log_content = log_content
+        if rows is not None:
+            self.show_rows(rows, keys)
+        else:
+            self.update_warning_log()
 
     def set_items(self, items):
-        # 清空当前布局中的所有小部件
         self.clear_layout(self.scroll_area_layout)
-        if items is None:
-            pass
-
-        # List of items to display (images and texts)
-        self.items = []
-        for item in items:
-            assert isinstance(item, list)
-            new_item = []
-            for views in item:
-                new_views = []
-                if isinstance(views, list):
-                    for step in views:
-                        if isinstance(step, Image.Image):
-                            step = resize_image(step, 512, 512)
-                        new_views.append(step)
-                else:
-                    new_views = views
-                new_item.append(new_views)
-            self.items.append(new_item)
-
-        self.show_next_item()
+        self.show_rows(render_covt_rows(resize_covt_seq(items)))
+
+    def show_rows(self, rows, keys=None):
+        """显示合成好的行, rows中为None的行复用keys中对应的已有控件"""
+        if keys is None:
+            keys = [object() for _ in rows]
+        # 病例切换时回到顶部, 同一病例保存后保持当前的滚动位置
+        case_changed = not self.row_keys or self.row_keys[0] != keys[0]
+
+        while self.scroll_area_layout.count():
+            self.scroll_area_layout.takeAt(0)
+        row_widgets = {}
+        for key, row in zip(keys, rows):
+            if row is None:
+                row_widgets[key] = self.row_widgets.pop(key)
+            else:
+                row_widgets[key] = self.create_row_widget(row)
+            self.scroll_area_layout.addWidget(row_widgets[key][0])
+
+        # 删除不再需要的行
+        for row_widget, image_labels in self.row_widgets.values():
+            for label in image_labels:
+                self.original_pixmaps.pop(label, None)
+            row_widget.deleteLater()
+        self.row_widgets = row_widgets
+        self.row_keys = list(keys)
+
+        if case_changed:
+            self.scroll_to_top()
         self.update_warning_log()
         self.resizeEvent(None)
 
-    def add_random_color_to_mask(self, org_img, img_data):
-        """
-        为org_img中img_data为255的区域添加显眼的随机颜色。
-
-        :param org_img: 原始RGBA图像 (Pillow Image)
-        :param img_data: 二值RGBA图像 (Pillow Image)
-        :return: 处理后的图像 (Pillow Image)
-        """
-        # 将图像转换为数组
-        if org_img is not None:
-            org_array = np.array(self.hist_imgs[-1])
-        else:
-            data_array = np.array(img_data)
-            return Image.fromarray(data_array, 'RGBA')
-
-        data_array = np.array(img_data)
-        # 随机生成颜色
-        random_color = [random.randint(0, 255) for _ in range(3)] + [128]  # 保持Alpha值为128
-        # 使用掩码设置特定区域的颜色
-        selected_array = data_array[:, :, 0] > 250
-        org_array[selected_array] = np.uint8(org_array[selected_array] * 0.7) + np.uint8(random_color) * 0.3
-
-        # 将数组转换回图像
-        result_img = Image.fromarray(org_array, 'RGBA')
-        return result_img
-
-    def show_item(self, item, img_idx=None, is_report=False, is_org_img=False):
+    def create_row_widget(self, row):
+        row_widget = QWidget(self.scroll_area_widget)
+        row_layout = QVBoxLayout(row_widget)
+        row_layout.setContentsMargins(0, 0, 0, 0)
+        image_labels = []
+        for item, is_report in row:
+            label = self.show_item(item, row_layout, is_report=is_report)
+            if isinstance(item, QImage):
+                image_labels.append(label)
+        self.add_divider(row_layout)
+        return row_widget, image_labels
+
+    def show_item(self, item, layout, is_report=False):
         if isinstance(item, str):  # Text
             self.current_text_label = QLabel(item, self)
             font = QFont("Arial", 16)
@@ -195,56 +673,25 @@ class AnimatedDisplay(QWidget):
             self.current_text_label.setFont(font)
             self.current_text_label.setWordWrap(True)
             self.current_text_label.setAlignment(Qt.AlignCenter)  # 居中文本
-            self.scroll_area_layout.addWidget(self.current_text_label)
-
-        elif isinstance(item, Image.Image):  # PIL Image
-            img_data = item.convert("RGBA")
-            self.current_image = img_data
+            layout.addWidget(self.current_text_label)
+            return self.current_text_label
 
-            if is_org_img:
-                org_img = None
-            else:
-                org_img = self.org_img1 if img_idx == 0 else self.org_img2
-            if len(self.hist_imgs) == 0 and org_img is not None:
-                self.hist_imgs.append(org_img)
-            img_data = self.add_random_color_to_mask(org_img, img_data)
-            self.hist_imgs.append(img_data)
-
-            q_image = QImage(img_data.tobytes(), img_data.width, img_data.height, QImage.Format_RGBA8888)
+        elif isinstance(item, QImage):
             self.current_image_label = QLabel(self)
-            self.pixmap_full = QPixmap.fromImage(q_image) 
+            self.pixmap_full = QPixmap.fromImage(item) 
             self.original_pixmaps[self.current_image_label] = self.pixmap_full
             
             self.current_image_label.setPixmap(self.pixmap_full)
             self.current_image_label.setAlignment(Qt.AlignCenter)
-            self.scroll_area_layout.addWidget(self.current_image_label)
+            layout.addWidget(self.current_image_label)
+            return self.current_image_label
 
-    def add_divider(self):
+    def add_divider(self, layout):
         line = QFrame()
         line.setFrameShape(QFrame.HLine)
         line.setFrameShadow(QFrame.Sunken)
         line.setStyleSheet("color: gray;")
-        self.scroll_area_layout.addWidget(line)
-
-    def show_next_item(self):
-        self.org_img1 = self.items[0][0][0].convert("RGBA")
-        if len(self.items[0]) > 2:
-            self.org_img2 = self.items[0][1][0].convert("RGBA")
-        else:
-            self.org_img2 = None
-        for r_idx, single_report_inference in enumerate(self.items):
-            for view_idx, single_view_inference in enumerate(single_report_inference):
-                if isinstance(single_view_inference, str):
-                    self.show_item(single_view_inference, is_report=True)
-                else:
-                    assert isinstance(single_view_inference, list)
-                    self.hist_imgs = []
-                    for step in single_view_inference:
-                        is_org_flag = r_idx == 0
-                        self.show_item(step, None) if isinstance(step, str) else self.show_item(step, view_idx, is_org_img=is_org_flag)
-            self.add_divider()
-
-        self.scroll_to_top()
+        layout.addWidget(line)
 
     def scroll_to_top(self):
         """Scroll to the top of the scroll area."""
@@ -252,139 +699,11 @@ class AnimatedDisplay(QWidget):
         scroll_bar.setValue(scroll_bar.minimum())
 
     def load_covt_seq(self, json_dir_path):
-        covt_seq = []
-        org_img_list = []
-        flags = list()
-
-        json_file_list = [file_name for file_name in os.listdir(json_dir_path) if file_name.endswith('.json')]
-        if len(json_file_list) == 0:
+        case = load_covt_case(json_dir_path)
+        if case is None:
             return None
         self.log_content = []
-
-        for json_file_name in json_file_list:
-            json_file_path = os.path.join(json_dir_path, json_file_name)
-            with open(json_file_path, 'r', encoding='utf-8') as f:
-                json_data = json.load(f)
-
-            if json_data['imageData'] is None:
-                self.log_content.append(f"{json_file_name}的imageData属性为空")
-                continue
-            image_data = base64.b64decode(json_data['imageData'])
-            image = Image.open(BytesIO(image_data))
-
-            org_img_list.append([image])
-            flags_list = json_data["flags"]
-            flags.extend([clean_sentence(flag) for flag in flags_list])
-        report_flags = remove_duplicates(flags)
-
-        org_img_list.append("Original chest x-ray images obtained")
-        covt_seq.append(org_img_list)
-
-        flags = [clean_sentence(flags[0])]
-        for json_file_name in json_file_list:
-
-            json_file_path = os.path.join(json_dir_path, json_file_name)
-            with open(json_file_path, 'r', encoding='utf-8') as f:
-                json_data = json.load(f)
-            
-            shapes = json_data['shapes']
-            for shape in shapes:
-                for k, v in shape['flags'].items():
-                    k = clean_sentence(k)
-                    if v and k not in flags:
-                        flags.append(k)
-
-        for ref_flag in report_flags:
-            if ref_flag not in flags:
-                self.log_content.append(f"原报告 {ref_flag}未标注，如果是正常修改报告引起的请忽略")
-
-        for flag in flags:
-            single_report_seq = []
-
-            # assert len(json_file_list) <= 2
-            
-            for json_file_name in json_file_list:
-                single_view_seq = []
-
-                json_file_path = os.path.join(json_dir_path, json_file_name)
-                with open(json_file_path, 'r', encoding='utf-8') as f:
-                    json_data = json.load(f)
-                
-                shapes = json_data["shapes"]
-                size = (json_data['imageWidth'], json_data['imageHeight'])               
-                for shape in shapes:
-                    label = shape['label']
-                    shape_flags = shape['flags']
-                    new_shape_flags = dict()
-                    for k, v in shape_flags.items():
-                        k = clean_sentence(k)
-                        new_shape_flags[k] = v
-                    shape_flags = new_shape_flags
-                    
-                    shape_type = shape['shape_type']
-
-                    if label not in cls2type.keys():
-                        self.log_content.append(f"出现了未知标签:{label}")
-                        continue
-                    if cls2type[label] != shape_type:
-                        self.log_content.append(f"{label}的标注类别为{shape_type}, 与期望的{cls2type[label]}不匹配")
-                    if flag not in shape_flags.keys():
-                        continue
-                    if not shape_flags[flag]:
-                        continue                            
-
-                    last_txt = single_view_seq[-1] if len(single_view_seq) > 0 else None
-                    new_canvas = Image.new('L', size, 0)
-
-                    points = shape['points']
-                    shape_type = shape['shape_type']
-                    description = shape["description"]
-
-                    if description is None:
-                        self.log_content.append(f"{label}的description为空,请补上")
-                        continue
-                    if description.endswith('.') or description.endswith('\n'):
-                        description = description[:-1]
-                    if description == last_txt and len(single_view_seq) > 1:
-                        canvas = copy.deepcopy(single_view_seq[-2])
-                    else:
-                        canvas = copy.deepcopy(new_canvas)
-
-                    draw = ImageDraw.Draw(new_canvas)
-                    if len(points) <= 1 and shape_type != 'point':
-                        self.log_content.append(f"{label}不是点标签，但是所获取的坐标点却只有一个")
-                        continue
-                    try:
-                        if shape_type == 'polygon':
-                            points = [tuple(point) for point in points]
-                            draw.polygon(points, fill=255)
-                        elif shape_type in ['linestrip', 'line']:
-                            for i in range(len(points) - 1):
-                                draw.line(points[i] + points[i + 1], fill=255, width=13)
-                        elif shape_type == 'point':
-                            for point in points:
-                                x, y = point
-                                r = 15
-                                draw.ellipse([(x - r, y - r), (x + r, y + r)], fill=255)
-                        elif shape_type == 'rectangle':
-                            points = convert_nested_to_int(points)
-                            points = flatten(points)
-                            draw.rectangle(points, fill=255)
-                    except Exception as e:
-                        self.log_content.append(f"请检查一下报错:\n"+str(e))
-                        continue
-
-                    merged_canvas_array = np.array(canvas) + np.array(new_canvas)
-                    merged_canvas_array[merged_canvas_array > 250] = 255
-                    if description == last_txt:
-                        single_view_seq[-2] = Image.fromarray(merged_canvas_array)
-                    else:
-                        single_view_seq.extend([Image.fromarray(merged_canvas_array), description])
-                single_report_seq.append(single_view_seq)
-            single_report_seq.append(f"Findings: {flag}")
-
-            covt_seq.append(single_report_seq)
-        return covt_seq
+        return build_covt_seq(case, self.log_content)
 
     def update_warning_log(self):
         """从日志文件读取警告信息并更新文本编辑器"""
@@ -1,5 +1,7 @@
 # flake8: noqa
 
+from . import covt_check
+from . import covt_embed
 from . import draw_json
 from . import draw_label_png
 from . import export_json
@@ -0,0 +1,130 @@
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import os.path as osp
+import sys
+
+from labelme.check import load_covt_case
+from labelme.check import remove_duplicates
+from labelme.check import validate_covt_case
+from labelme.logger import logger
+
+
+def parse_since(value):
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return datetime.datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            "expected a unix timestamp or an ISO 8601 date: {}".format(value)
+        )
+
+
+def iter_case_dirs(root, since=None):
+    """Yield every directory under root that contains JSON files.
+
+    They may not be label files (e.g. report.json), validate_case skips
+    directories without any.
+
+    With since, only cases with a JSON file modified at or after it are yielded.
+    """
+    json_mtimes = []
+    sub_dirs = []
+    try:
+        with os.scandir(root) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    sub_dirs.append(entry.path)
+                elif entry.name.endswith(".json") and entry.is_file():
+                    json_mtimes.append(entry.stat().st_mtime)
+    except OSError as e:
+        logger.warning("Failed to scan {}: {}".format(root, e))
+        return
+
+    if json_mtimes and (since is None or max(json_mtimes) >= since):
+        yield root
+    for sub_dir in sorted(sub_dirs):
+        yield from iter_case_dirs(sub_dir, since=since)
+
+
+def validate_case(case_dir):
+    """Return the result of a case, None if it has no label files."""
+    result = dict(case=case_dir)
+    try:
+        case = load_covt_case(case_dir, decode_images=False)
+        if case is None:
+            return None
+        log_content = []
+        validate_covt_case(case, log_content)
+    except Exception as e:
+        result["error"] = "{}: {}".format(type(e).__name__, e)
+        return result
+    result["views"] = [view["name"] for view in case]
+    result["warnings"] = remove_duplicates(log_content)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Validate CoVT annotations of every case under a dataset root "
+        "and write one JSON line per case."
+    )
+    parser.add_argument("root", help="dataset root, e.g. MIMIC-CXR files/")
+    parser.add_argument(
+        "-o",
+        "--output",
+        help="JSONL file to write (default: stdout)",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=os.cpu_count(),
+        help="number of worker processes (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--since",
+        type=parse_since,
+        help="only check cases with label files modified at or after this "
+        "unix timestamp or ISO 8601 date",
+    )
+    parser.add_argument(
+        "--only-failed",
+        action="store_true",
+        help="only write cases with warnings or errors",
+    )
+    args = parser.parse_args()
+
+    if not osp.isdir(args.root):
+        logger.error("No such directory: {}".format(args.root))
+        sys.exit(1)
+
+    out = sys.stdout if args.output is None else open(args.output, "w")
+
+    n_cases = n_failed = 0
+    case_dirs = iter_case_dirs(args.root, since=args.since)
+    with multiprocessing.Pool(processes=max(1, args.jobs)) as pool:
+        for result in pool.imap_unordered(validate_case, case_dirs, chunksize=16):
+            if result is None:
+                continue
+            n_cases += 1
+            failed = bool(result.get("error") or result.get("warnings"))
+            n_failed += failed
+            if args.only_failed and not failed:
+                continue
+            result["case"] = osp.relpath(result["case"], args.root)
+            out.write(json.dumps(result, ensure_ascii=False) + "\n")
+            out.flush()
+
+    if out is not sys.stdout:
+        out.close()
+    logger.info("Checked {} cases, {} with problems".format(n_cases, n_failed))
+
+
+if __name__ == "__main__":
+    main()
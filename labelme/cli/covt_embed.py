@@ -0,0 +1,239 @@
+import argparse
+import collections
+import concurrent.futures
+import os
+import os.path as osp
+import sys
+import time
+
+import onnxruntime
+from qtpy import QtGui
+
+import labelme.ai
+from labelme.ai.embedding_cache import image_key
+from labelme.ai_prediction import model_input_image
+from labelme.config import get_config
+from labelme.label_file import LabelFile
+from labelme.logger import logger
+from labelme.scanner import scan_images
+
+
+def load_encoder_input(model, filename, output_dir=None):
+    """Return (key, encoder input) of an image, the input is None if cached.
+
+    The image is decoded and converted like the shown one, so that the key is
+    the one looked up by the app.
+    """
+    image_data = LabelFile.load_shown_image_data(filename, output_dir)
+    image = QtGui.QImage.fromData(image_data or b"")
+    if image.isNull():
+        raise IOError("Failed to decode image")
+    image = model_input_image(image)
+    key = image_key(image)
+    if key in model.image_embedding_cache:
+        return key, None
+    return key, model.preprocess_image(image)
+
+
+def iter_loaded(load, filenames, jobs):
+    """Yield (filename, load(filename), error) in order, loading ahead in threads.
+
+    At most 2 * jobs images are loaded ahead, to bound the memory.
+    """
+    with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as executor:
+        pending = collections.deque()
+        for filename in filenames:
+            pending.append((filename, executor.submit(load, filename)))
+            if len(pending) >= 2 * jobs:
+                yield _get_result(*pending.popleft())
+        while pending:
+            yield _get_result(*pending.popleft())
+
+
+def _get_result(filename, future):
+    try:
+        return filename, future.result(), None
+    except Exception as e:
+        return filename, None, e
+
+
+def make_session_options(intra_op_threads, inter_op_threads):
+    options = onnxruntime.SessionOptions()
+    options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+    options.intra_op_num_threads = intra_op_threads
+    options.inter_op_num_threads = inter_op_threads
+    if inter_op_threads > 1:
+        options.execution_mode = onnxruntime.ExecutionMode.ORT_PARALLEL
+    else:
+        options.execution_mode = onnxruntime.ExecutionMode.ORT_SEQUENTIAL
+    return options
+
+
+def main():
+    config = get_config(osp.join(osp.expanduser("~"), ".labelmerc"))
+    model_names = [model.name for model in labelme.ai.MODELS]
+
+    parser = argparse.ArgumentParser(
+        description="Compute the AI image embeddings of every image under a "
+        "dataset root into the embedding cache of labelme-covt."
+    )
+    parser.add_argument("root", help="dataset root, e.g. MIMIC-CXR files/p10")
+    parser.add_argument(
+        "--model",
+        choices=model_names,
+        default=config["ai"]["default"],
+        help="AI model (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--output",
+        help="directory of the label files, as given to labelme-covt",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=min(4, os.cpu_count() or 1),
+        help="number of threads reading and preprocessing images "
+        "(default: %(default)s)",
+    )
+    parser.add_argument(
+        "-b",
+        "--batch-size",
+        type=int,
+        default=4,
+        help="images per encoder run, if the model allows batches "
+        "(default: %(default)s)",
+    )
+    parser.add_argument(
+        "--intra-op-threads",
+        type=int,
+        default=0,
+        help="threads of an encoder operator (default: onnxruntime's, 0)",
+    )
+    parser.add_argument(
+        "--inter-op-threads",
+        type=int,
+        default=1,
+        help="encoder operators run in parallel (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--cache-max-bytes",
+        type=int,
+        default=config["ai"]["embedding_cache"]["max_bytes"],
+        help="size of the embedding cache, the least recently used embeddings "
+        "beyond it are evicted (default: ai.embedding_cache.max_bytes of "
+        "~/.labelmerc, %(default)s)",
+    )
+    args = parser.parse_args()
+
+    if not osp.isdir(args.root):
+        logger.error("No such directory: {}".format(args.root))
+        sys.exit(1)
+
+    model = labelme.ai.MODELS[model_names.index(args.model)](
+        session_options=make_session_options(
+            intra_op_threads=args.intra_op_threads,
+            inter_op_threads=args.inter_op_threads,
+        ),
+        embedding_cache_max_bytes=args.cache_max_bytes,
+    )
+    cache = model.image_embedding_cache
+
+    extensions = [
+        ".%s" % fmt.data().decode().lower()
+        for fmt in QtGui.QImageReader.supportedImageFormats()
+    ]
+    filenames = scan_images(args.root, extensions)
+    logger.info("Found {} images under {}".format(len(filenames), args.root))
+    # None until the first embedding is computed, if the encoder's is dynamic
+    embedding_nbytes = model.image_embedding_nbytes()
+    if (
+        cache.cache_dir is not None
+        and embedding_nbytes is not None
+        and len(filenames) * embedding_nbytes > cache.max_bytes
+    ):
+        logger.warning(
+            "The embeddings of {} images take up to {:.1f} GB, more than the "
+            "{:.1f} GB of the cache: embeddings stop when it is full".format(
+                len(filenames),
+                len(filenames) * embedding_nbytes / (1 << 30),
+                cache.max_bytes / (1 << 30),
+            )
+        )
+
+    n_computed = n_cached = n_failed = 0
+    n_bytes = 0  # of the embeddings computed
+    is_full = False
+    t_start = time.time()
+
+    def encode(batch):
+        nonlocal n_computed, n_bytes, embedding_nbytes, is_full
+        if cache.cache_dir is not None and embedding_nbytes is not None:
+            # more would evict the embeddings computed first
+            n_fit = max(0, (cache.max_bytes - n_bytes) // embedding_nbytes)
+            if n_fit < len(batch):
+                batch = batch[:n_fit]
+                is_full = True
+        if not batch:
+            return
+        embeddings = model.compute_image_embeddings([x for _, _, x in batch])
+        for (_, key, _), embedding in zip(batch, embeddings):
+            cache.put(key, embedding)
+            n_bytes += embedding.nbytes
+            embedding_nbytes = embedding.nbytes
+        n_computed += len(batch)
+        logger.info(
+            "Computed {} embeddings ({:.2f} s/image)".format(
+                n_computed, (time.time() - t_start) / n_computed
+            )
+        )
+
+    # inputs of different shapes (e.g. EfficientSam's) are batched separately
+    batches = collections.OrderedDict()  # input shape -> [(filename, key, x)]
+    pending_keys = set()  # e.g. of duplicated images
+    n_pending = 0
+    for filename, result, error in iter_loaded(
+        lambda filename: load_encoder_input(model, filename, args.output),
+        filenames,
+        jobs=max(1, args.jobs),
+    ):
+        if error is not None:
+            logger.warning("Failed to load {}: {}".format(filename, error))
+            n_failed += 1
+            continue
+        key, x = result
+        if x is None or key in pending_keys:
+            n_cached += 1
+            continue
+        batches.setdefault(x.shape, []).append((filename, key, x))
+        pending_keys.add(key)
+        n_pending += 1
+        if len(batches[x.shape]) >= args.batch_size:
+            batch = batches.pop(x.shape)
+        elif n_pending >= 2 * args.batch_size:
+            _, batch = batches.popitem(last=False)
+        else:
+            continue
+        n_pending -= len(batch)
+        encode(batch)
+        if is_full:
+            break
+    else:
+        for batch in batches.values():
+            encode(batch)
+
+    logger.info(
+        "Computed {} embeddings, {} were cached, {} images failed".format(
+            n_computed, n_cached, n_failed
+        )
+    )
+    if is_full:
+        logger.warning(
+            "Stopped as the {:.1f} GB cache is full, the other images were not "
+            "embedded: raise ai.embedding_cache.max_bytes in ~/.labelmerc (or "
+            "--cache-max-bytes) to embed them".format(cache.max_bytes / (1 << 30))
+        )
+
+
+if __name__ == "__main__":
+    main()
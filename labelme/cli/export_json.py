@@ -1,13 +1,13 @@
 import argparse
-import base64
-import json
 import os
 import os.path as osp
 
 import imgviz
 import PIL.Image
 
+from labelme import object_store
 from labelme import utils
+from labelme.label_file import load_json
 from labelme.logger import logger
 
 
@@ -27,15 +27,14 @@ def main():
     if not osp.exists(out_dir):
         os.mkdir(out_dir)
 
-    data = json.load(open(json_file))
-    imageData = data.get("imageData")
+    data = load_json(json_file)
+    imageData = object_store.read_image_data(json_file, data)
 
-    if not imageData:
+    if imageData is None:
         imagePath = os.path.join(os.path.dirname(json_file), data["imagePath"])
         with open(imagePath, "rb") as f:
             imageData = f.read()
-            imageData = base64.b64encode(imageData).decode("utf-8")
-    img = utils.img_b64_to_arr(imageData)
+    img = utils.img_data_to_arr(imageData)
 
     label_name_to_value = {"_background_": 0}
     for shape in sorted(data["shapes"], key=lambda x: x["label"]):
@@ -49,6 +49,14 @@ def validate_config_item(key, value):
         raise ValueError(
             "Unexpected value for config key 'shape_color': {}".format(value)
         )
+    if key == "image_data_store" and value not in ["json", "sidecar"]:
+        raise ValueError(
+            "Unexpected value for config key 'image_data_store': {}".format(value)
+        )
+    if key == "max_bytes" and (not isinstance(value, int) or value <= 0):
+        raise ValueError(
+            "Unexpected value for config key 'max_bytes': {}".format(value)
+        )
     if key == "labels" and value is not None and len(value) != len(set(value)):
         raise ValueError(
             "Duplicates are detected for config key 'labels': {}".format(value)
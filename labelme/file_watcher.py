@@ -0,0 +1,180 @@
+import os
+
+from qtpy import QtCore
+
+from labelme.logger import logger
+
+# stats the polled directories, replaceable to simulate slow file systems
+_stat = os.stat
+
+
+class DirectoryPollSignals(QtCore.QObject):
+    polled = QtCore.Signal(int, object)
+
+
+class DirectoryPollTask(QtCore.QRunnable):
+    """Stat directories in a background thread, as it can block on network
+    shares. signals.polled(token, {directory: mtime}) sends the mtimes back,
+    -1 for the directories that are gone."""
+
+    def __init__(self, token, dirs):
+        super(DirectoryPollTask, self).__init__()
+        self.token = token
+        self.dirs = dirs
+        self.signals = DirectoryPollSignals()
+
+    def run(self):
+        mtimes = {}
+        for dirpath in self.dirs:
+            try:
+                mtimes[dirpath] = _stat(dirpath).st_mtime_ns
+            except OSError:
+                mtimes[dirpath] = -1
+        self.signals.polled.emit(self.token, mtimes)
+
+
+class DirectoryWatcher(QtCore.QObject):
+    """Report directories whose entries were added, removed or renamed.
+
+    Up to maxWatches directories are watched with QFileSystemWatcher (inotify
+    and friends). The others, including those the system refuses to watch
+    (e.g. past fs.inotify.max_user_watches or on some network shares), are
+    polled: every pollInterval ms the mtimes of the next pollBatch of them
+    are read in a background thread and compared with the last seen ones.
+
+    Changes are coalesced for a short delay and emitted together with
+    directoriesChanged(list of directories).
+    """
+
+    directoriesChanged = QtCore.Signal(list)
+
+    def __init__(
+        self,
+        maxWatches=65536,
+        pollInterval=1000,
+        pollBatch=256,
+        coalesceDelay=200,
+        parent=None,
+    ):
+        super(DirectoryWatcher, self).__init__(parent)
+        self.maxWatches = maxWatches
+        self.pollBatch = pollBatch
+
+        self._watcher = QtCore.QFileSystemWatcher(self)
+        self._watcher.directoryChanged.connect(self._onDirectoryChanged)
+        self._watched = set()
+
+        # polled directory -> last seen mtime, None until it is first polled
+        self._polled = {}
+        self._pollQueue = []
+        self._pollTimer = QtCore.QTimer(self)
+        self._pollTimer.setInterval(pollInterval)
+        self._pollTimer.timeout.connect(self._poll)
+        # not owned by the watcher, whose deletion would otherwise wait for a
+        # poll blocked on a network share, while holding the GIL the poll needs
+        self._pollPool = QtCore.QThreadPool.globalInstance()
+        self._pollToken = 0
+        self._polling = False
+
+        self._pending = set()
+        self._emitTimer = QtCore.QTimer(self)
+        self._emitTimer.setSingleShot(True)
+        self._emitTimer.setInterval(coalesceDelay)
+        self._emitTimer.timeout.connect(self._emitPending)
+
+    def directories(self):
+        return self._watched | set(self._polled)
+
+    def __contains__(self, dirpath):
+        return dirpath in self._watched or dirpath in self._polled
+
+    def setDirectories(self, dirs):
+        self.clear()
+        self.addDirectories(dirs)
+
+    def addDirectories(self, dirs):
+        dirs = [d for d in dict.fromkeys(dirs) if d not in self]
+        if not dirs:
+            return
+        n_watches = max(0, self.maxWatches - len(self._watched))
+        toWatch, toPoll = dirs[:n_watches], dirs[n_watches:]
+        if toWatch:
+            failed = set(self._watcher.addPaths(toWatch))
+            self._watched.update(d for d in toWatch if d not in failed)
+            toPoll.extend(d for d in toWatch if d in failed)
+        if toPoll:
+            logger.info("Polling {} directories for changes".format(len(toPoll)))
+            for dirpath in toPoll:
+                self._polled[dirpath] = None
+            if not self._pollTimer.isActive():
+                self._pollTimer.start()
+
+    def removeDirectories(self, dirs):
+        watched = [d for d in dirs if d in self._watched]
+        if watched:
+            self._watcher.removePaths(watched)
+            self._watched.difference_update(watched)
+        for dirpath in dirs:
+            self._polled.pop(dirpath, None)
+        if not self._polled:
+            self._pollTimer.stop()
+
+    def clear(self):
+        if self._watched:
+            self._watcher.removePaths(list(self._watched))
+        self._watched = set()
+        self._polled = {}
+        self._pollQueue = []
+        self._pollTimer.stop()
+        self._pollToken += 1
+        self._polling = False
+        self._pending = set()
+        self._emitTimer.stop()
+
+    def _onDirectoryChanged(self, dirpath):
+        if dirpath not in self._watched:
+            return
+        if not os.path.isdir(dirpath):
+            # removed directories are dropped by QFileSystemWatcher
+            self._watched.discard(dirpath)
+        self._pending.add(dirpath)
+        self._emitTimer.start()
+
+    def _poll(self):
+        if self._polling:
+            return  # the last poll is still blocked, one runs at a time
+        if not self._pollQueue:
+            self._pollQueue = list(self._polled)
+        batch = self._pollQueue[-self.pollBatch :]
+        del self._pollQueue[-self.pollBatch :]
+        if not batch:
+            return
+        self._polling = True
+        task = DirectoryPollTask(self._pollToken, batch)
+        task.signals.polled.connect(self._onPolled)
+        self._pollPool.start(task)
+
+    def waitForPoll(self, msecs=-1):
+        return self._pollPool.waitForDone(msecs)
+
+    def _onPolled(self, token, mtimes):
+        if token != self._pollToken:
+            return
+        self._polling = False
+        for dirpath, mtime in mtimes.items():
+            if dirpath not in self._polled:
+                continue  # removed meanwhile
+            lastMtime = self._polled[dirpath]
+            self._polled[dirpath] = mtime
+            if lastMtime is not None and mtime != lastMtime:
+                if mtime == -1:
+                    del self._polled[dirpath]
+                self._pending.add(dirpath)
+        if self._pending and not self._emitTimer.isActive():
+            self._emitTimer.start()
+
+    def _emitPending(self):
+        if self._pending:
+            dirs = sorted(self._pending)
+            self._pending = set()
+            self.directoriesChanged.emit(dirs)
@@ -1,7 +1,9 @@
 import base64
 import contextlib
+import functools
 import io
 import json
+import math
 import os.path as osp
 
 import PIL.Image
@@ -9,6 +11,7 @@ import PIL.Image
 from labelme import PY2
 from labelme import QT4
 from labelme import __version__
+from labelme import object_store
 from labelme import utils
 from labelme.logger import logger
 
@@ -31,17 +34,154 @@ class LabelFileError(Exception):
     pass
 
 
+def _is_finite(data):
+    """Return False if data holds a NaN or infinite float."""
+    stack = [data]
+    while stack:
+        obj = stack.pop()
+        if isinstance(obj, float):
+            if not math.isfinite(obj):
+                return False
+        elif isinstance(obj, dict):
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple)):
+            stack.extend(obj)
+    return True
+
+
+def _orjson_backend():
+    import orjson
+
+    # types the stdlib cannot serialize are rejected too
+    option = (
+        orjson.OPT_INDENT_2
+        | orjson.OPT_NON_STR_KEYS
+        | orjson.OPT_PASSTHROUGH_DATACLASS
+        | orjson.OPT_PASSTHROUGH_DATETIME
+    )
+
+    def dumps(data):
+        # orjson writes NaN and infinity as null
+        if not _is_finite(data):
+            raise ValueError("Out of range float values are not supported")
+        return orjson.dumps(data, option=option)
+
+    return orjson.loads, dumps
+
+
+def _ujson_backend():
+    import ujson
+
+    def dumps(data):
+        return ujson.dumps(
+            data, ensure_ascii=False, indent=2, escape_forward_slashes=False
+        ).encode("utf-8")
+
+    return ujson.loads, dumps
+
+
+def _stdlib_json_backend():
+    def dumps(data):
+        return json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8")
+
+    return json.loads, dumps
+
+
+#: JSON backends in order of preference, the first importable one is used
+JSON_BACKENDS = {
+    "orjson": _orjson_backend,
+    "ujson": _ujson_backend,
+    "json": _stdlib_json_backend,
+}
+
+_json_loads = None
+_json_dumps = None
+json_backend = None
+
+
+def set_json_backend(name=None):
+    """Select the backend reading and writing label JSON, the fastest if None.
+
+    Every backend writes UTF-8 JSON indented by 2 spaces and accepts the same
+    data, what they cannot write is written by the stdlib (see json_dumps).
+    Only the exponent of floats may be formatted differently, e.g. orjson
+    writes 1e-7 and 1e16 where the stdlib writes 1e-07 and 1e+16, which are
+    read back as the same values.
+    """
+    global _json_loads, _json_dumps, json_backend
+    names = list(JSON_BACKENDS) if name is None else [name]
+    for name in names:
+        try:
+            _json_loads, _json_dumps = JSON_BACKENDS[name]()
+        except ImportError:
+            continue
+        json_backend = name
+        logger.debug("Using JSON backend: {}".format(name))
+        return
+    raise ImportError("JSON backend is not available: {}".format(name))
+
+
+def json_loads(s):
+    """Parse label JSON from bytes or str."""
+    try:
+        return _json_loads(s)
+    except ValueError:
+        if json_backend == "json":
+            raise
+        # e.g. NaN, which the fast backends reject
+        return json.loads(s)
+
+
+def json_dumps(data):
+    """Serialize label JSON to UTF-8 bytes."""
+    try:
+        return _json_dumps(data)
+    except (TypeError, ValueError, OverflowError):
+        if json_backend == "json":
+            raise
+        # e.g. integers beyond 64 bits or NaN, which the fast backends reject,
+        # and values no backend supports, for which the stdlib raises
+        return _stdlib_json_backend()[1](data)
+
+
+def load_json(filename):
+    with io.open(filename, "rb") as f:
+        return json_loads(f.read())
+
+
+def save_json(filename, data):
+    """Write label JSON atomically, a crash never leaves a partial file."""
+    utils.atomic_write(filename, json_dumps(data))
+
+
+set_json_backend()
+
+
 class LabelFile(object):
     suffix = ".json"
 
-    def __init__(self, filename=None):
+    def __init__(self, filename=None, lazy=False):
         self.shapes = []
         self.imagePath = None
         self.imageData = None
+        self.imageHeight = None
+        self.imageWidth = None
         if filename is not None:
-            self.load(filename)
+            self.load(filename, lazy=lazy)
         self.filename = filename
 
+    @property
+    def imageData(self):
+        if self._loadImageData is not None:
+            loadImageData, self._loadImageData = self._loadImageData, None
+            self._imageData = loadImageData()
+        return self._imageData
+
+    @imageData.setter
+    def imageData(self, imageData):
+        self._imageData = imageData
+        self._loadImageData = None
+
     @staticmethod
     def load_image_file(filename):
         try:
@@ -50,25 +190,59 @@ class LabelFile(object):
             logger.error("Failed opening image file: {}".format(filename))
             return
 
+        ext = osp.splitext(filename)[1].lower()
+        if PY2 and QT4:
+            format = "PNG"
+        elif ext in [".jpg", ".jpeg"]:
+            format = "JPEG"
+        else:
+            format = "PNG"
+
         # apply orientation to image according to exif
-        image_pil = utils.apply_exif_orientation(image_pil)
+        oriented_pil = utils.apply_exif_orientation(image_pil)
+        if oriented_pil is image_pil and image_pil.format == format:
+            # nothing to transform, avoid decoding and (lossy) re-encoding
+            image_pil.close()
+            with io.open(filename, "rb") as f:
+                return f.read()
 
         with io.BytesIO() as f:
-            ext = osp.splitext(filename)[1].lower()
-            if PY2 and QT4:
-                format = "PNG"
-            elif ext in [".jpg", ".jpeg"]:
-                format = "JPEG"
-            else:
-                format = "PNG"
-            image_pil.save(f, format=format)
+            oriented_pil.save(f, format=format)
             f.seek(0)
             return f.read()
 
-    def load(self, filename):
+    @staticmethod
+    def get_label_file(image_file, output_dir=None):
+        """Return the label file of an image file, in output_dir if given."""
+        label_file = osp.splitext(image_file)[0] + LabelFile.suffix
+        if output_dir:
+            label_file = osp.join(output_dir, osp.basename(label_file))
+        return label_file
+
+    @staticmethod
+    def load_shown_image_data(image_file, output_dir=None):
+        """Return the image data the app shows for an image file.
+
+        It is the one of the image's label file if there is one, so that the
+        app and the CLIs, e.g. labelme-covt-embed, read the same image.
+        """
+        label_file = LabelFile.get_label_file(image_file, output_dir)
+        if osp.exists(label_file) and LabelFile.is_label_file(label_file):
+            return LabelFile(label_file, lazy=True).imageData
+        return LabelFile.load_image_file(image_file)
+
+    def load(self, filename, lazy=False):
+        """Load a label file.
+
+        With lazy, only the annotations are parsed: imageData is decoded (or
+        read from imagePath) on first access, and imageHeight and imageWidth
+        come from the label file or, if missing, from the embedded image's
+        header.
+        """
         keys = [
             "version",
             "imageData",
+            "imageDataRef",  # key of imageData in the sidecar object store
             "imagePath",
             "shapes",  # polygonal annotations
             "flags",  # image level flags
@@ -85,24 +259,36 @@ class LabelFile(object):
             "mask",
         ]
         try:
-            with open(filename, "r") as f:
-                data = json.load(f)
+            data = load_json(filename)
 
             if data["imageData"] is not None:
-                imageData = base64.b64decode(data["imageData"])
-                if PY2 and QT4:
-                    imageData = utils.img_data_to_png_data(imageData)
+                loadImageData = functools.partial(
+                    self._decode_image_data, data["imageData"]
+                )
+            elif data.get("imageDataRef"):
+                loadImageData = functools.partial(
+                    object_store.read_object,
+                    object_store.get_objects_dir(filename),
+                    data["imageDataRef"],
+                )
             else:
                 # relative path from label file to relative path from cwd
                 imagePath = osp.join(osp.dirname(filename), data["imagePath"])
-                imageData = self.load_image_file(imagePath)
+                loadImageData = functools.partial(self.load_image_file, imagePath)
             flags = data.get("flags") or {}
             imagePath = data["imagePath"]
-            self._check_image_height_and_width(
-                base64.b64encode(imageData).decode("utf-8"),
-                data.get("imageHeight"),
-                data.get("imageWidth"),
-            )
+            imageHeight = data.get("imageHeight")
+            imageWidth = data.get("imageWidth")
+            if not lazy:
+                imageData = loadImageData()
+                imageHeight, imageWidth = self._check_image_height_and_width(
+                    imageData, imageHeight, imageWidth
+                )
+            else:
+                imageData = None
+                embedded = data["imageData"] is not None or data.get("imageDataRef")
+                if embedded and None in (imageHeight, imageWidth):
+                    imageHeight, imageWidth = utils.img_data_to_size(loadImageData())
             shapes = [
                 dict(
                     label=s["label"],
@@ -129,24 +315,46 @@ class LabelFile(object):
         self.shapes = shapes
         self.imagePath = imagePath
         self.imageData = imageData
+        self.imageHeight = imageHeight
+        self.imageWidth = imageWidth
         self.filename = filename
         self.otherData = otherData
+        if lazy:
+            self._loadImageData = functools.partial(
+                self._loadImageDataLazily, loadImageData
+            )
+
+    def _loadImageDataLazily(self, loadImageData):
+        imageData = loadImageData()
+        if imageData is not None:
+            self.imageHeight, self.imageWidth = self._check_image_height_and_width(
+                imageData, self.imageHeight, self.imageWidth
+            )
+        return imageData
+
+    @staticmethod
+    def _decode_image_data(imageDataB64):
+        imageData = base64.b64decode(imageDataB64)
+        if PY2 and QT4:
+            imageData = utils.img_data_to_png_data(imageData)
+        return imageData
 
     @staticmethod
     def _check_image_height_and_width(imageData, imageHeight, imageWidth):
-        img_arr = utils.img_b64_to_arr(imageData)
-        if imageHeight is not None and img_arr.shape[0] != imageHeight:
+        # only the header is read, the image is not decoded
+        height, width = utils.img_data_to_size(imageData)
+        if imageHeight is not None and height != imageHeight:
             logger.error(
                 "imageHeight does not match with imageData or imagePath, "
                 "so getting imageHeight from actual image."
             )
-            imageHeight = img_arr.shape[0]
-        if imageWidth is not None and img_arr.shape[1] != imageWidth:
+            imageHeight = height
+        if imageWidth is not None and width != imageWidth:
             logger.error(
                 "imageWidth does not match with imageData or imagePath, "
                 "so getting imageWidth from actual image."
             )
-            imageWidth = img_arr.shape[1]
+            imageWidth = width
         return imageHeight, imageWidth
 
     def save(
@@ -159,12 +367,31 @@ class LabelFile(object):
         imageData=None,
         otherData=None,
         flags=None,
+        imageDataStore="json",
     ):
+        """Save the label file.
+
+        imageData is embedded in the JSON as base64 if imageDataStore is
+        'json'. If it is 'sidecar', it is written to the object store next to
+        the label file (see labelme.object_store) and only its key is saved.
+        """
+        if imageDataStore not in ["json", "sidecar"]:
+            raise ValueError("Unexpected imageDataStore: {}".format(imageDataStore))
+        imageDataRef = None
         if imageData is not None:
-            imageData = base64.b64encode(imageData).decode("utf-8")
             imageHeight, imageWidth = self._check_image_height_and_width(
                 imageData, imageHeight, imageWidth
             )
+            if imageDataStore == "sidecar":
+                try:
+                    imageDataRef = object_store.write_object(
+                        object_store.get_objects_dir(filename), imageData
+                    )
+                except OSError as e:
+                    raise LabelFileError(e)
+                imageData = None
+            else:
+                imageData = base64.b64encode(imageData).decode("utf-8")
         if otherData is None:
             otherData = {}
         if flags is None:
@@ -178,12 +405,13 @@ class LabelFile(object):
             imageHeight=imageHeight,
             imageWidth=imageWidth,
         )
+        if imageDataRef is not None:
+            data["imageDataRef"] = imageDataRef
         for key, value in otherData.items():
             assert key not in data
             data[key] = value
         try:
-            with open(filename, "w") as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            save_json(filename, data)
             self.filename = filename
         except Exception as e:
             raise LabelFileError(e)
@@ -0,0 +1,109 @@
+import collections
+import os.path as osp
+import threading
+
+from qtpy import QtCore
+
+from labelme.logger import logger
+
+
+class LabelFileWriteTask(QtCore.QRunnable):
+    def __init__(self, writer):
+        super(LabelFileWriteTask, self).__init__()
+        self.writer = writer
+
+    def run(self):
+        self.writer._drain()
+
+
+class LabelFileWriter(QtCore.QObject):
+    """Write label files in a background thread (write-behind).
+
+    A write is a callable submitted for a file. Writes are queued per file:
+    submitting one with replace=True drops the writes still pending for that
+    file, since only the latest state needs to hit the disk, while
+    replace=False appends it (e.g. a read-modify-write of the file). Files are
+    written one at a time, in the order they were first submitted.
+
+    saved(filename) or failed(filename, error) is emitted once the writes of a
+    file are done. Pending writes are waited for with wait(), e.g. before
+    reading the file again, and flush() before quitting.
+    """
+
+    saved = QtCore.Signal(str)
+    failed = QtCore.Signal(str, object)
+
+    def __init__(self, parent=None):
+        super(LabelFileWriter, self).__init__(parent)
+        self._cond = threading.Condition()
+        self._pending = collections.OrderedDict()  # filename -> writes
+        self._writing = None
+        self._running = False
+
+        self._pool = QtCore.QThreadPool(self)
+        self._pool.setMaxThreadCount(1)
+
+    @staticmethod
+    def _key(filename):
+        return osp.normcase(osp.abspath(filename))
+
+    def submit(self, filename, write, replace=True):
+        key = self._key(filename)
+        with self._cond:
+            if replace or key not in self._pending:
+                self._pending[key] = (filename, [write])
+            else:
+                self._pending[key][1].append(write)
+            if not self._running:
+                self._running = True
+                self._pool.start(LabelFileWriteTask(self))
+
+    def isPending(self, filename=None):
+        with self._cond:
+            return self._isPending(filename)
+
+    def _isPending(self, filename):
+        if filename is None:
+            return self._running
+        key = self._key(filename)
+        return key in self._pending or key == self._writing
+
+    def wait(self, filename=None, timeout=None):
+        """Wait for the pending writes of filename (of all files if None).
+
+        Return False if they are not done after timeout seconds.
+        """
+        with self._cond:
+            return self._cond.wait_for(
+                lambda: not self._isPending(filename), timeout=timeout
+            )
+
+    def flush(self, timeout=None):
+        return self.wait(timeout=timeout)
+
+    def _drain(self):
+        while True:
+            with self._cond:
+                if not self._pending:
+                    self._running = False
+                    self._cond.notify_all()
+                    return
+                key, (filename, writes) = self._pending.popitem(last=False)
+                self._writing = key
+
+            error = None
+            for write in writes:
+                try:
+                    write()
+                except Exception as e:
+                    logger.error("Failed to write {}: {}".format(filename, e))
+                    error = e
+                    break
+
+            with self._cond:
+                self._writing = None
+                self._cond.notify_all()
+            if error is None:
+                self.saved.emit(filename)
+            else:
+                self.failed.emit(filename, error)
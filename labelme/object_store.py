@@ -0,0 +1,51 @@
+import base64
+import hashlib
+import os
+import os.path as osp
+
+from labelme import utils
+
+OBJECTS_DIR = osp.join(".labelme", "objects")
+
+
+def get_objects_dir(label_file):
+    """Return the object store of the label files in label_file's directory."""
+    return osp.join(osp.dirname(osp.abspath(label_file)), OBJECTS_DIR)
+
+
+def object_path(objects_dir, key):
+    if not key or osp.basename(key) != key or key.startswith("."):
+        raise ValueError("Invalid object key: {!r}".format(key))
+    return osp.join(objects_dir, key)
+
+
+def write_object(objects_dir, data):
+    """Store data under its SHA-256 and return the key (hex digest).
+
+    Objects are immutable, data already in the store is not written again.
+    """
+    key = hashlib.sha256(data).hexdigest()
+    path = object_path(objects_dir, key)
+    if osp.exists(path):
+        return key
+    os.makedirs(objects_dir, exist_ok=True)
+    utils.atomic_write(path, data)
+    return key
+
+
+def read_object(objects_dir, key):
+    with open(object_path(objects_dir, key), "rb") as f:
+        return f.read()
+
+
+def read_image_data(label_file, data):
+    """Return the image bytes stored in a label file's JSON data, None if none.
+
+    The image is either embedded as base64 in imageData or, with the sidecar
+    store, referenced by imageDataRef.
+    """
+    if data.get("imageData"):
+        return base64.b64decode(data["imageData"])
+    if data.get("imageDataRef"):
+        return read_object(get_objects_dir(label_file), data["imageDataRef"])
+    return None
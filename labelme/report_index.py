@@ -0,0 +1,232 @@
+import codecs
+import hashlib
+import json
+import os
+import os.path as osp
+import sqlite3
+import threading
+
+from labelme.logger import logger
+
+INDEX_VERSION = 1
+
+
+def get_default_cache_dir():
+    return osp.join(osp.expanduser("~"), ".cache", "labelme", "report_index")
+
+
+def report_key(ref_img):
+    """Convert a report's ref_img to a case index.
+
+    e.g. '\\p10\\p10000032\\s50414267' -> 'p10-p10000032-s50414267'
+    """
+    return ref_img.replace("\\", "-")[1:]
+
+
+def _file_sha256(filename):
+    sha256 = hashlib.sha256()
+    with open(filename, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def _iter_json_array(f, chunk_size):
+    """Yield the elements of the top-level JSON array in the binary file f.
+
+    Only the current chunk and the element being decoded are held in memory.
+    """
+    decoder = json.JSONDecoder()
+    utf8_decoder = codecs.getincrementaldecoder("utf-8")()
+    buf = ""
+    pos = 0
+    eof = False
+
+    def fill(buf, pos):
+        chunk = f.read(chunk_size)
+        return buf[pos:] + utf8_decoder.decode(chunk, final=not chunk), 0, not chunk
+
+    def skip_whitespace(buf, pos, eof):
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n":
+                pos += 1
+            if pos < len(buf) or eof:
+                return buf, pos, eof
+            buf, pos, eof = fill(buf, pos)
+
+    buf, pos, eof = skip_whitespace(buf, pos, eof)
+    if buf[pos : pos + 1] == "\ufeff":
+        buf, pos, eof = skip_whitespace(buf, pos + 1, eof)
+    if buf[pos : pos + 1] != "[":
+        raise ValueError("report JSON must be an array of items")
+    buf, pos, eof = skip_whitespace(buf, pos + 1, eof)
+    if buf[pos : pos + 1] == "]":
+        return
+
+    while True:
+        try:
+            item, pos = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            # the element continues in the next chunk
+            buf, pos, eof = fill(buf, pos)
+            continue
+        yield item
+
+        buf, pos, eof = skip_whitespace(buf, pos, eof)
+        separator = buf[pos : pos + 1]
+        if separator == "]":
+            return
+        if separator != ",":
+            raise ValueError("unexpected {!r} in report JSON".format(separator))
+        buf, pos, eof = skip_whitespace(buf, pos + 1, eof)
+
+
+def iter_report_items(report_json, progress=None, chunk_size=1 << 20):
+    """Stream (case index, content) pairs from the report JSON.
+
+    The file is parsed incrementally (with ijson if it is installed), so the
+    whole document is never held in memory. progress is called with the number
+    of bytes read so far and the file size.
+    """
+    total = os.path.getsize(report_json)
+    with open(report_json, "rb") as f:
+        try:
+            import ijson
+
+            items = ijson.items(f, "item")
+        except ImportError:
+            items = _iter_json_array(f, chunk_size=chunk_size)
+        for i, item in enumerate(items):
+            yield report_key(item["ref_img"]), item["content"]
+            if progress is not None and i % 1000 == 0:
+                progress(f.tell(), total)
+    if progress is not None:
+        progress(total, total)
+
+
+class ReportIndex(object):
+    """Read-only mapping from case index to report content.
+
+    The report JSON is compiled once into an SQLite file in cache_dir and looked
+    up lazily afterwards. The index is reused while the report's size and mtime
+    are unchanged, or, if they changed, while its SHA-256 is unchanged.
+    """
+
+    def __init__(self, report_json, cache_dir=None, progress=None):
+        self.report_json = osp.abspath(report_json)
+        if cache_dir is None:
+            cache_dir = get_default_cache_dir()
+        name = hashlib.sha1(self.report_json.encode("utf-8")).hexdigest()
+        self.index_file = osp.join(cache_dir, name + ".sqlite")
+
+        self._lock = threading.Lock()
+        self._conn = None
+        if not self._open_if_valid():
+            self.build(progress=progress)
+
+    def _stat(self):
+        stat = os.stat(self.report_json)
+        return stat.st_size, stat.st_mtime_ns
+
+    def _open_if_valid(self):
+        if not osp.exists(self.index_file):
+            return False
+        conn = None
+        try:
+            conn = sqlite3.connect(self.index_file, check_same_thread=False)
+            meta = dict(conn.execute("SELECT key, value FROM meta"))
+        except sqlite3.Error as e:
+            logger.warning(
+                "Ignoring broken report index {}: {}".format(self.index_file, e)
+            )
+            if conn is not None:
+                conn.close()  # before the index file is rebuilt
+            return False
+
+        size, mtime_ns = self._stat()
+        valid = meta.get("version") == str(INDEX_VERSION) and meta.get("size") == str(
+            size
+        )
+        if valid and meta.get("mtime_ns") != str(mtime_ns):
+            # touched or copied, only trust the index if the content is the same
+            valid = meta.get("sha256") == _file_sha256(self.report_json)
+            if valid:
+                with conn:
+                    conn.execute(
+                        "UPDATE meta SET value = ? WHERE key = 'mtime_ns'",
+                        (str(mtime_ns),),
+                    )
+        if not valid:
+            conn.close()
+            return False
+        self._conn = conn
+        return True
+
+    def build(self, items=None, progress=None):
+        """Compile the report JSON into the index file and open it.
+
+        items is an iterable of (case index, content) and defaults to the items
+        streamed from the report JSON, reporting to progress as in
+        iter_report_items.
+        """
+        if items is None:
+            items = iter_report_items(self.report_json, progress=progress)
+        logger.info("Building report index: {}".format(self.index_file))
+        size, mtime_ns = self._stat()
+        sha256 = _file_sha256(self.report_json)
+
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+        os.makedirs(osp.dirname(self.index_file), exist_ok=True)
+        tmp_file = self.index_file + ".tmp"
+        if osp.exists(tmp_file):
+            os.remove(tmp_file)
+        conn = sqlite3.connect(tmp_file)
+        with conn:
+            conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+            conn.execute("CREATE TABLE report (key TEXT PRIMARY KEY, content TEXT)")
+            conn.executemany(
+                "INSERT OR REPLACE INTO report VALUES (?, ?)",
+                items,
+            )
+            conn.executemany(
+                "INSERT INTO meta VALUES (?, ?)",
+                [
+                    ("version", str(INDEX_VERSION)),
+                    ("source", self.report_json),
+                    ("size", str(size)),
+                    ("mtime_ns", str(mtime_ns)),
+                    ("sha256", sha256),
+                ],
+            )
+        conn.close()
+        os.replace(tmp_file, self.index_file)
+        self._conn = sqlite3.connect(self.index_file, check_same_thread=False)
+
+    def get(self, key, default=None):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content FROM report WHERE key = ?", (key,)
+            ).fetchone()
+        return default if row is None else row[0]
+
+    def __getitem__(self, key):
+        content = self.get(key)
+        if content is None:
+            raise KeyError(key)
+        return content
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM report").fetchone()[0]
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
@@ -0,0 +1,134 @@
+import concurrent.futures
+import os
+import os.path as osp
+
+import natsort
+
+from labelme.logger import logger
+
+
+def case_index(patient_id, case_id):
+    """Return the report key of a case directory, e.g. 'p10-p10000032-s50414267'.
+
+    Case directories named like 'p10-...' already carry the patient and are
+    keyed by themselves.
+    """
+    if "-" in case_id:
+        return case_id[:3] + "-" + case_id
+    return patient_id[:3] + "-" + patient_id + "-" + case_id
+
+
+def case_index_from_path(filename):
+    """Return the case index of an image path (.../<patient>/<case>/<image>)."""
+    case_dir = osp.dirname(osp.normpath(filename))
+    patient_dir = osp.dirname(case_dir)
+    return case_index(osp.basename(patient_dir), osp.basename(case_dir))
+
+
+#: key sorting paths like natsort.os_sorted, i.e. in the order of scan_images
+path_sort_key = natsort.os_sort_keygen()
+
+
+def _scan_dir(dirpath, patient_id, extensions, case_filter):
+    """Return (path, is_dir) of the accepted images and sub directories of dirpath.
+
+    Entries are in natural order, so that concatenating the scanned directories
+    depth-first gives natsort.os_sorted of all the paths without sorting them as
+    a whole.
+    """
+    try:
+        with os.scandir(dirpath) as it:
+            entries = sorted(it, key=lambda entry: path_sort_key(entry.name))
+    except OSError as e:
+        logger.warning("Failed to scan {}: {}".format(dirpath, e))
+        return []
+
+    items = []
+    accepted = None
+    for entry in entries:
+        if entry.is_dir():
+            if not entry.is_symlink():
+                items.append((entry.path, True))
+            continue
+        if accepted is False:
+            continue
+        name = entry.name
+        if name[name.rfind(".") :].lower() not in extensions:
+            continue
+        if accepted is None:
+            # all images of a directory belong to the same case
+            accepted = case_filter is None or case_filter(
+                case_index(patient_id, osp.basename(dirpath))
+            )
+            if not accepted:
+                continue
+        items.append((entry.path, False))
+    return items
+
+
+def _scan_tree(dirpath, patient_id, extensions, case_filter, dirs):
+    images = []
+    case_id = osp.basename(dirpath)
+    if dirs is not None:
+        dirs.append(dirpath)
+    for path, is_dir in _scan_dir(dirpath, patient_id, extensions, case_filter):
+        if is_dir:
+            images.extend(_scan_tree(path, case_id, extensions, case_filter, dirs))
+        else:
+            images.append(path)
+    return images
+
+
+def scan_directory(dirpath, extensions, case_filter=None):
+    """Return the images and the sub directories directly in dirpath.
+
+    Unlike scan_images this does not recurse, it is used to update a scanned
+    tree when one of its directories changed.
+    """
+    dirpath = osp.normpath(dirpath)
+    extensions = frozenset(ext.lower() for ext in extensions)
+    patient_id = osp.basename(osp.dirname(osp.abspath(dirpath)))
+    images = []
+    sub_dirs = []
+    for path, is_dir in _scan_dir(dirpath, patient_id, extensions, case_filter):
+        (sub_dirs if is_dir else images).append(path)
+    return images, sub_dirs
+
+
+def scan_images(root, extensions, case_filter=None, workers=None, dirs=None):
+    """Return the naturally sorted image files under root.
+
+    Args:
+        root: directory to scan recursively (symlinked directories are skipped).
+        extensions: suffixes to accept, e.g. {'.jpg', '.png'}.
+        case_filter: callable taking a case index; the images of a directory
+            are skipped if its case is rejected.
+        workers: if > 1, the directories directly under root (e.g. MIMIC-CXR
+            patients) are scanned by that many threads.
+        dirs: if a list, every scanned directory is appended to it.
+    """
+    root = osp.normpath(root)
+    extensions = frozenset(ext.lower() for ext in extensions)
+    parent_id = osp.basename(osp.dirname(osp.abspath(root)))
+    root_id = osp.basename(root)
+
+    if not workers or workers <= 1:
+        return _scan_tree(root, parent_id, extensions, case_filter, dirs)
+
+    if dirs is not None:
+        dirs.append(root)
+    items = _scan_dir(root, parent_id, extensions, case_filter)
+    images = []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(_scan_tree, path, root_id, extensions, case_filter, dirs)
+            if is_dir
+            else path
+            for path, is_dir in items
+        ]
+        for future in futures:
+            if isinstance(future, concurrent.futures.Future):
+                images.extend(future.result())
+            else:
+                images.append(future)
+    return images
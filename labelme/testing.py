@@ -1,25 +1,26 @@
-import json
 import os.path as osp
 
 import imgviz
 
+import labelme.label_file
+import labelme.object_store
 import labelme.utils
 
 
 def assert_labelfile_sanity(filename):
     assert osp.exists(filename)
 
-    data = json.load(open(filename))
+    data = labelme.label_file.load_json(filename)
 
     assert "imagePath" in data
-    imageData = data.get("imageData", None)
+    imageData = labelme.object_store.read_image_data(filename, data)
     if imageData is None:
         parent_dir = osp.dirname(filename)
         img_file = osp.join(parent_dir, data["imagePath"])
         assert osp.exists(img_file)
         img = imgviz.io.imread(img_file)
     else:
-        img = labelme.utils.img_b64_to_arr(imageData)
+        img = labelme.utils.img_data_to_arr(imageData)
 
     H, W = img.shape[:2]
     assert H == data["imageHeight"]
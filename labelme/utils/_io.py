@@ -1,12 +1,33 @@
 # MIT License
 # Copyright (c) Kentaro Wada
 
+import os
 import os.path as osp
 
 import numpy as np
 import PIL.Image
 
 
+def atomic_write(filename, data):
+    """Write bytes to filename so that it is either left untouched or complete.
+
+    The data is written and synced to a temporary file in the same directory,
+    which then replaces filename.
+    """
+    dirname, basename = osp.split(osp.abspath(filename))
+    tmp_file = osp.join(dirname, ".{}.{}.tmp".format(basename, os.getpid()))
+    try:
+        with open(tmp_file, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, filename)
+    except BaseException:
+        if osp.exists(tmp_file):
+            os.remove(tmp_file)
+        raise
+
+
 def lblsave(filename, lbl):
     import imgviz
 
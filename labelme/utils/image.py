@@ -23,6 +23,13 @@ def img_data_to_arr(img_data):
     return img_arr
 
 
+def img_data_to_size(img_data):
+    """Return (height, width) of encoded image data, reading only its header."""
+    with PIL.Image.open(io.BytesIO(img_data)) as img_pil:
+        width, height = img_pil.size
+    return height, width
+
+
 def img_b64_to_arr(img_b64):
     img_data = base64.b64decode(img_b64)
     img_arr = img_data_to_arr(img_data)
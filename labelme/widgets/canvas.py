@@ -1,4 +1,3 @@
-import imgviz
 from qtpy import QtCore
 from qtpy import QtGui
 from qtpy import QtWidgets
@@ -6,6 +5,9 @@ from qtpy import QtWidgets
 import labelme.ai
 import labelme.utils
 from labelme import QT5
+from labelme.ai_prediction import AiPredictionScheduler
+from labelme.ai_prediction import model_input_image
+from labelme.ai_prediction import predict_shape
 from labelme.logger import logger
 from labelme.shape import Shape
 
@@ -30,6 +32,7 @@ class Canvas(QtWidgets.QWidget):
     shapeMoved = QtCore.Signal()
     drawingPolygon = QtCore.Signal(bool)
     vertexSelected = QtCore.Signal(bool)
+    aiModelInitialized = QtCore.Signal()
 
     CREATE, EDIT = 0, 1
 
@@ -59,6 +62,9 @@ class Canvas(QtWidgets.QWidget):
                 "ai_mask": False,
             },
         )
+        self._embedding_cache_max_bytes = kwargs.pop(
+            "embedding_cache_max_bytes", labelme.ai.embedding_cache.DEFAULT_MAX_BYTES
+        )
         super(Canvas, self).__init__(*args, **kwargs)
         # Initialise local state.
         self.mode = self.EDIT
@@ -101,6 +107,9 @@ class Canvas(QtWidgets.QWidget):
         self.setFocusPolicy(QtCore.Qt.WheelFocus)
 
         self._ai_model = None
+        # the preview of ai_polygon and ai_mask is predicted in the background
+        self._aiPrediction = AiPredictionScheduler(parent=self)
+        self._aiPrediction.predicted.connect(self.update)
 
     def fillDrawing(self):
         return self._fill_drawing
@@ -127,6 +136,9 @@ class Canvas(QtWidgets.QWidget):
             raise ValueError("Unsupported createMode: %s" % value)
         self._createMode = value
 
+    def aiModel(self):
+        return self._ai_model
+
     def initializeAiModel(self, name):
         if name not in [model.name for model in labelme.ai.MODELS]:
             raise ValueError("Unsupported ai model: %s" % name)
@@ -136,15 +148,17 @@ class Canvas(QtWidgets.QWidget):
             logger.debug("AI model is already initialized: %r" % model.name)
         else:
             logger.debug("Initializing AI model: %r" % model.name)
-            self._ai_model = model()
+            self._aiPrediction.cancel()
+            self._ai_model = model(
+                embedding_cache_max_bytes=self._embedding_cache_max_bytes
+            )
 
         if self.pixmap is None:
             logger.warning("Pixmap is not set yet")
             return
 
-        self._ai_model.set_image(
-            image=labelme.utils.img_qt_to_arr(self.pixmap.toImage())
-        )
+        self._ai_model.set_image(image=model_input_image(self.pixmap.toImage()))
+        self.aiModelInitialized.emit()
 
     def storeShapes(self):
         shapesBackup = []
@@ -739,44 +753,27 @@ class Canvas(QtWidgets.QWidget):
             drawing_shape.addPoint(self.line[1])
             drawing_shape.fill = True
             drawing_shape.paint(p)
-        elif self.createMode == "ai_polygon" and self.current is not None:
-            drawing_shape = self.current.copy()
-            drawing_shape.addPoint(
-                point=self.line.points[1],
-                label=self.line.point_labels[1],
-            )
-            points = self._ai_model.predict_polygon_from_points(
-                points=[[point.x(), point.y()] for point in drawing_shape.points],
-                point_labels=drawing_shape.point_labels,
-            )
-            if len(points) > 2:
-                drawing_shape.setShapeRefined(
-                    shape_type="polygon",
-                    points=[QtCore.QPointF(point[0], point[1]) for point in points],
-                    point_labels=[1] * len(points),
-                )
-                drawing_shape.fill = self.fillDrawing()
-                drawing_shape.selected = True
-                drawing_shape.paint(p)
-        elif self.createMode == "ai_mask" and self.current is not None:
-            drawing_shape = self.current.copy()
-            drawing_shape.addPoint(
-                point=self.line.points[1],
-                label=self.line.point_labels[1],
-            )
-            mask = self._ai_model.predict_mask_from_points(
-                points=[[point.x(), point.y()] for point in drawing_shape.points],
-                point_labels=drawing_shape.point_labels,
+        elif self.createMode in ["ai_polygon", "ai_mask"] and self.current is not None:
+            points = [[point.x(), point.y()] for point in self.current.points]
+            point_labels = list(self.current.point_labels)
+            # only requested here, the latest prediction is drawn meanwhile
+            self._aiPrediction.request(
+                self._ai_model,
+                self.createMode,
+                points=points + [[self.line.points[1].x(), self.line.points[1].y()]],
+                point_labels=point_labels + [self.line.point_labels[1]],
             )
-            y1, x1, y2, x2 = imgviz.instances.masks_to_bboxes([mask])[0].astype(int)
-            drawing_shape.setShapeRefined(
-                shape_type="mask",
-                points=[QtCore.QPointF(x1, y1), QtCore.QPointF(x2, y2)],
-                point_labels=[1, 1],
-                mask=mask[y1 : y2 + 1, x1 : x2 + 1],
+            prediction = self._aiPrediction.result(
+                self.createMode, points=points, point_labels=point_labels
             )
-            drawing_shape.selected = True
-            drawing_shape.paint(p)
+            if prediction is not None:
+                drawing_shape = self.current.copy()
+                self._setPredictedShape(drawing_shape, *prediction)
+                if drawing_shape.shape_type == "polygon":
+                    drawing_shape.fill = self.fillDrawing()
+                if drawing_shape.shape_type == "mask" or len(drawing_shape.points) > 2:
+                    drawing_shape.selected = True
+                    drawing_shape.paint(p)
 
         p.end()
 
@@ -799,32 +796,24 @@ class Canvas(QtWidgets.QWidget):
 
     def finalise(self):
         assert self.current
-        if self.createMode == "ai_polygon":
-            # convert points to polygon by an AI model
+        if self.createMode in ["ai_polygon", "ai_mask"]:
+            # convert points to polygon or mask by an AI model
             assert self.current.shape_type == "points"
-            points = self._ai_model.predict_polygon_from_points(
-                points=[[point.x(), point.y()] for point in self.current.points],
-                point_labels=self.current.point_labels,
-            )
-            self.current.setShapeRefined(
-                points=[QtCore.QPointF(point[0], point[1]) for point in points],
-                point_labels=[1] * len(points),
-                shape_type="polygon",
-            )
-        elif self.createMode == "ai_mask":
-            # convert points to mask by an AI model
-            assert self.current.shape_type == "points"
-            mask = self._ai_model.predict_mask_from_points(
-                points=[[point.x(), point.y()] for point in self.current.points],
-                point_labels=self.current.point_labels,
-            )
-            y1, x1, y2, x2 = imgviz.instances.masks_to_bboxes([mask])[0].astype(int)
-            self.current.setShapeRefined(
-                shape_type="mask",
-                points=[QtCore.QPointF(x1, y1), QtCore.QPointF(x2, y2)],
-                point_labels=[1, 1],
-                mask=mask[y1 : y2 + 1, x1 : x2 + 1],
+            points = [[point.x(), point.y()] for point in self.current.points]
+            # usually the preview of the last click, otherwise decoded again
+            # (or taken from the model's decoder cache)
+            prediction = self._aiPrediction.get(
+                self.createMode, points, self.current.point_labels
             )
+            self._aiPrediction.cancel()
+            if prediction is None:
+                prediction = predict_shape(
+                    self._ai_model,
+                    self.createMode,
+                    points=points,
+                    point_labels=self.current.point_labels,
+                )
+            self._setPredictedShape(self.current, *prediction)
         self.current.close()
 
         self.shapes.append(self.current)
@@ -834,6 +823,23 @@ class Canvas(QtWidgets.QWidget):
         self.newShape.emit()
         self.update()
 
+    @staticmethod
+    def _setPredictedShape(shape, points, mask):
+        """Replace the clicked points of shape by the shape predicted from them."""
+        if mask is None:
+            shape.setShapeRefined(
+                shape_type="polygon",
+                points=[QtCore.QPointF(x, y) for x, y in points],
+                point_labels=[1] * len(points),
+            )
+        else:
+            shape.setShapeRefined(
+                shape_type="mask",
+                points=[QtCore.QPointF(x, y) for x, y in points],
+                point_labels=[1, 1],
+                mask=mask,
+            )
+
     def closeEnough(self, p1, p2):
         # d = distance(p1 - p2)
         # m = (p1-p2).manhattanLength()
@@ -1011,10 +1017,9 @@ class Canvas(QtWidgets.QWidget):
 
     def loadPixmap(self, pixmap, clear_shapes=True):
         self.pixmap = pixmap
+        self._aiPrediction.cancel()
         if self._ai_model:
-            self._ai_model.set_image(
-                image=labelme.utils.img_qt_to_arr(self.pixmap.toImage())
-            )
+            self._ai_model.set_image(image=model_input_image(self.pixmap.toImage()))
         if clear_shapes:
             self.shapes = []
         self.update()
@@ -0,0 +1,471 @@
+import os
+import os.path as osp
+import time
+
+from qtpy import QtCore
+from qtpy import QtWidgets
+from qtpy.QtCore import Qt
+
+from labelme.file_search import FileSearchIndex
+from labelme.file_search import search_predicate
+from labelme.logger import logger
+
+
+class LabelFileScanSignals(QtCore.QObject):
+    checked = QtCore.Signal(int, object, object)
+
+
+class LabelFileScanTask(QtCore.QRunnable):
+    """Find which images have a label file in a background thread.
+
+    Instead of a stat per label file, each directory holding label files is
+    listed once, which matters on network shares. Results are sent back in
+    batches with signals.checked(token, paths, has_label_files).
+    """
+
+    batch_size = 512
+    batch_interval = 0.1
+
+    def __init__(self, token, paths, labelFileOf, isCurrent):
+        super(LabelFileScanTask, self).__init__()
+        self.token = token
+        self.paths = paths
+        self.labelFileOf = labelFileOf
+        self.isCurrent = isCurrent
+        self.signals = LabelFileScanSignals()
+
+    def _listDir(self, dirpath):
+        try:
+            with os.scandir(dirpath) as it:
+                return frozenset(osp.normcase(entry.name) for entry in it)
+        except OSError:
+            return frozenset()
+
+    def run(self):
+        listings = {}
+        paths = []
+        states = []
+        last_emit = time.monotonic()
+        for path in self.paths:
+            if not self.isCurrent(self.token):
+                return
+            try:
+                label_file = self.labelFileOf(path)
+                dirpath, name = osp.split(label_file)
+                if dirpath not in listings:
+                    listings[dirpath] = self._listDir(dirpath)
+                states.append(osp.normcase(name) in listings[dirpath])
+            except Exception as e:
+                logger.warning("Failed to check label file of {}: {}".format(path, e))
+                states.append(False)
+            paths.append(path)
+
+            if (
+                len(paths) >= self.batch_size
+                or time.monotonic() - last_emit > self.batch_interval
+            ):
+                self.signals.checked.emit(self.token, paths, states)
+                paths = []
+                states = []
+                last_emit = time.monotonic()
+        if paths:
+            self.signals.checked.emit(self.token, paths, states)
+
+
+class FileListModel(QtCore.QAbstractListModel):
+    """Image paths with an O(1) path to row lookup.
+
+    All the paths are kept in order, the rows are those passing the filter set
+    with setFilter. The check state of a path tells whether its image has a
+    label file. It is Qt.PartiallyChecked (unknown) until the background scan
+    reaches the path.
+    """
+
+    def __init__(self, labelFileOf=None, parent=None):
+        super(FileListModel, self).__init__(parent)
+        self._allPaths = []
+        self._dirs = {}  # directory -> paths of its images
+        self._paths = []
+        self._rows = {}
+        self._filter = None
+        self._searchIndex = None
+        self._stemIndex = None  # file name without extension -> paths
+        self._checkStates = {}
+        self._rechecking = set()
+        self._labelFileOf = labelFileOf
+
+        self._scanPool = QtCore.QThreadPool(self)
+        self._scanPool.setMaxThreadCount(1)
+        self._scanToken = 0
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self._paths)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row = index.row()
+        if role in (Qt.DisplayRole, Qt.ToolTipRole):
+            return self._paths[row]
+        if role == Qt.CheckStateRole:
+            return self.checkState(row)
+        return None
+
+    def flags(self, index):
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable | Qt.ItemNeverHasChildren
+
+    def allPaths(self):
+        return self._allPaths
+
+    def paths(self):
+        return self._paths
+
+    def path(self, row):
+        return self._paths[row]
+
+    def row(self, path):
+        return self._rows.get(path, -1)
+
+    def contains(self, path):
+        return osp.dirname(path) in self._dirs and path in self._dirs[osp.dirname(path)]
+
+    def dirs(self):
+        return self._dirs.keys()
+
+    def pathsInDir(self, dirpath):
+        return set(self._dirs.get(dirpath, ()))
+
+    def _accepts(self, path):
+        return self._filter is None or self._filter(path)
+
+    def _updateRows(self, start=0):
+        for row in range(start, len(self._paths)):
+            self._rows[self._paths[row]] = row
+
+    def setPaths(self, paths):
+        self._searchIndex = None
+        self._stemIndex = None
+        self.beginResetModel()
+        self._allPaths = []
+        self._dirs = {}
+        for path in paths:
+            if self._addToDir(path):
+                self._allPaths.append(path)
+        self._paths = [p for p in self._allPaths if self._accepts(p)]
+        self._rows = {}
+        self._updateRows()
+        self._checkStates = {}
+        self._rechecking = set()
+        self.endResetModel()
+        self._cancelScan()
+        self._scan(self._allPaths)
+
+    def _addToDir(self, path):
+        dirPaths = self._dirs.setdefault(osp.dirname(path), set())
+        if path in dirPaths:
+            return False
+        dirPaths.add(path)
+        return True
+
+    def addPaths(self, paths):
+        """Append paths at the end."""
+        paths = [p for p in paths if self._addToDir(p)]
+        if not paths:
+            return
+        self._searchIndex = None
+        self._stemIndex = None
+        self._allPaths.extend(paths)
+        visible = [p for p in paths if self._accepts(p)]
+        if visible:
+            first = len(self._paths)
+            self.beginInsertRows(QtCore.QModelIndex(), first, first + len(visible) - 1)
+            self._paths.extend(visible)
+            self._updateRows(first)
+            self.endInsertRows()
+        self._scan(paths)
+
+    def insertPaths(self, paths, key):
+        """Insert paths where they belong in the order given by key.
+
+        The paths are merged into the lists in one pass, the rows are inserted
+        by contiguous blocks and the row map is updated once.
+        """
+        keyed = [(key(p), p) for p in paths if self._addToDir(p)]
+        if not keyed:
+            return
+        self._searchIndex = None
+        self._stemIndex = None
+        keyed.sort(key=lambda item: item[0])
+        pathKeys = [pathKey for pathKey, _ in keyed]
+        paths = [path for _, path in keyed]
+        allRows = _insertionRows(self._allPaths, pathKeys, key)
+        self._allPaths = _merge(self._allPaths, paths, allRows)
+
+        if self._filter is None:
+            visible, rows = paths, allRows
+        else:
+            accepted = [i for i, p in enumerate(paths) if self._accepts(p)]
+            visible = [paths[i] for i in accepted]
+            rows = _insertionRows(self._paths, [pathKeys[i] for i in accepted], key)
+        # (row in the current list, paths inserted there)
+        blocks = []
+        for row, path in zip(rows, visible):
+            if blocks and blocks[-1][0] == row:
+                blocks[-1][1].append(path)
+            else:
+                blocks.append((row, [path]))
+        # last rows first, so that the rows of the other blocks do not move
+        for row, block in reversed(blocks):
+            self.beginInsertRows(QtCore.QModelIndex(), row, row + len(block) - 1)
+            self._paths[row:row] = block
+            self.endInsertRows()
+        if blocks:
+            self._updateRows(blocks[0][0])
+        self._scan(paths)
+
+    def removePaths(self, paths):
+        removed = set()
+        for path in paths:
+            dirPaths = self._dirs.get(osp.dirname(path))
+            if dirPaths is None or path not in dirPaths:
+                continue
+            dirPaths.discard(path)
+            if not dirPaths:
+                del self._dirs[osp.dirname(path)]
+            removed.add(path)
+            self._checkStates.pop(path, None)
+            self._rechecking.discard(path)
+        if not removed:
+            return
+        self._searchIndex = None
+        self._stemIndex = None
+        self._allPaths = [p for p in self._allPaths if p not in removed]
+        rows = sorted(self._rows.pop(p) for p in removed if p in self._rows)
+        # remove contiguous ranges of rows, last first
+        while rows:
+            last = first = rows.pop()
+            while rows and rows[-1] == first - 1:
+                first = rows.pop()
+            self.beginRemoveRows(QtCore.QModelIndex(), first, last)
+            del self._paths[first : last + 1]
+            self.endRemoveRows()
+        self._updateRows()
+
+    def setFilter(self, predicate, paths=None):
+        """Show only the paths for which predicate(path) is true (all if None).
+
+        paths, if given, are the paths accepted by predicate, in order.
+        """
+        self.beginResetModel()
+        self._filter = predicate
+        if paths is None:
+            paths = [p for p in self._allPaths if self._accepts(p)]
+        self._paths = paths
+        self._rows = {}
+        self._updateRows()
+        self.endResetModel()
+
+    def setSearchPattern(self, pattern):
+        """Show only the paths matching pattern like re.search, using an index."""
+        if self._searchIndex is None:
+            self._searchIndex = FileSearchIndex(self._allPaths)
+        ids = self._searchIndex.search(pattern)
+        if ids is None:
+            paths = list(self._allPaths)
+        else:
+            paths = [self._allPaths[i] for i in ids]
+        self.setFilter(search_predicate(pattern), paths)
+
+    def pathsWithStem(self, stem):
+        """Return the paths named stem plus an extension, using an index."""
+        if self._stemIndex is None:
+            self._stemIndex = {}
+            for path in self._allPaths:
+                self._stemIndex.setdefault(_stem(path), []).append(path)
+        return self._stemIndex.get(osp.normcase(stem), [])
+
+    def checkState(self, row):
+        return self._checkStates.get(self._paths[row], Qt.PartiallyChecked)
+
+    def setCheckState(self, path, state):
+        self._checkStates[path] = state
+        self._rechecking.discard(path)
+        row = self._rows.get(path)
+        if row is not None:
+            index = self.index(row)
+            self.dataChanged.emit(index, index, [Qt.CheckStateRole])
+
+    def setLabelFileOf(self, labelFileOf):
+        self._labelFileOf = labelFileOf
+        self.invalidateCheckStates()
+
+    def invalidateCheckStates(self):
+        self._cancelScan()
+        self._checkStates = {}
+        self._rechecking = set()
+        if self._paths:
+            self.dataChanged.emit(
+                self.index(0), self.index(len(self._paths) - 1), [Qt.CheckStateRole]
+            )
+        self._scan(self._allPaths)
+
+    def recheckPaths(self, paths):
+        """Scan the label files of paths again, keeping their states meanwhile."""
+        paths = [p for p in paths if self.contains(p)]
+        self._rechecking.update(paths)
+        self._scan(paths)
+
+    def isScanning(self):
+        return self._scanPool.activeThreadCount() > 0
+
+    def waitForScan(self, msecs=-1):
+        return self._scanPool.waitForDone(msecs)
+
+    def isCurrentScan(self, token):
+        return token == self._scanToken
+
+    def _cancelScan(self):
+        self._scanToken += 1
+        self._scanPool.clear()
+
+    def _scan(self, paths):
+        if not paths:
+            return
+        if self._labelFileOf is None:
+            self._onChecked(self._scanToken, paths, [False] * len(paths))
+            return
+        task = LabelFileScanTask(
+            self._scanToken, list(paths), self._labelFileOf, self.isCurrentScan
+        )
+        task.signals.checked.connect(self._onChecked)
+        self._scanPool.start(task)
+
+    def _onChecked(self, token, paths, states):
+        if not self.isCurrentScan(token):
+            return
+        rows = []
+        for path, hasLabelFile in zip(paths, states):
+            # states set meanwhile, e.g. by saving, are newer than the scan
+            if path in self._checkStates and path not in self._rechecking:
+                continue
+            if not self.contains(path):
+                continue
+            self._rechecking.discard(path)
+            self._checkStates[path] = Qt.Checked if hasLabelFile else Qt.Unchecked
+            if path in self._rows:
+                rows.append(self._rows[path])
+        if rows:
+            self.dataChanged.emit(
+                self.index(min(rows)), self.index(max(rows)), [Qt.CheckStateRole]
+            )
+
+
+def _stem(path):
+    return osp.normcase(osp.splitext(osp.basename(path))[0])
+
+
+def _insertionRows(sortedPaths, pathKeys, key):
+    """Return where each of the sorted pathKeys goes in sortedPaths.
+
+    Keys are computed at most once per path of sortedPaths, as the searches of
+    the keys share the first steps of the bisection.
+    """
+    keys = {}
+    rows = []
+    for pathKey in pathKeys:
+        lo, hi = 0, len(sortedPaths)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if mid not in keys:
+                keys[mid] = key(sortedPaths[mid])
+            if keys[mid] < pathKey:
+                lo = mid + 1
+            else:
+                hi = mid
+        rows.append(lo)
+    return rows
+
+
+def _merge(sortedPaths, paths, rows):
+    """Return sortedPaths with each of paths inserted at its row."""
+    merged = []
+    start = 0
+    for row, path in zip(rows, paths):
+        merged.extend(sortedPaths[start:row])
+        merged.append(path)
+        start = row
+    merged.extend(sortedPaths[start:])
+    return merged
+
+
+class FileListWidget(QtWidgets.QListView):
+    """Virtualized list of image files, only the visible rows are laid out."""
+
+    itemSelectionChanged = QtCore.Signal()
+
+    def __init__(self, labelFileOf=None, parent=None):
+        super(FileListWidget, self).__init__(parent)
+        self.setModel(FileListModel(labelFileOf=labelFileOf, parent=self))
+        self.setUniformItemSizes(True)
+        self.setSelectionMode(QtWidgets.QAbstractItemView.SingleSelection)
+        self.selectionModel().selectionChanged.connect(
+            lambda selected, deselected: self.itemSelectionChanged.emit()
+        )
+
+    def __len__(self):
+        return self.model().rowCount()
+
+    def __contains__(self, path):
+        return self.model().row(path) >= 0
+
+    def count(self):
+        return len(self)
+
+    def paths(self):
+        return self.model().paths()
+
+    def path(self, row):
+        return self.model().path(row)
+
+    def row(self, path):
+        return self.model().row(path)
+
+    def setPaths(self, paths):
+        self.model().setPaths(paths)
+
+    def addPaths(self, paths):
+        self.model().addPaths(paths)
+
+    def clear(self):
+        self.model().setPaths([])
+
+    def setFilter(self, predicate):
+        """Filter the shown paths, keeping the selected one if it still shows."""
+        self._keepSelection(self.model().setFilter, predicate)
+
+    def setSearchPattern(self, pattern):
+        self._keepSelection(self.model().setSearchPattern, pattern)
+
+    def _keepSelection(self, func, *args):
+        selected = self.selectedPaths()
+        self.blockSignals(True)
+        try:
+            func(*args)
+            if selected and selected[0] in self:
+                self.setCurrentRow(self.row(selected[0]))
+        finally:
+            self.blockSignals(False)
+
+    def currentRow(self):
+        return self.currentIndex().row()
+
+    def setCurrentRow(self, row):
+        self.setCurrentIndex(self.model().index(row))
+
+    def selectedPaths(self):
+        return [self.model().path(index.row()) for index in self.selectedIndexes()]
+
+    def setCheckState(self, path, state):
+        self.model().setCheckState(path, state)
@@ -0,0 +1,178 @@
+import collections
+import threading
+import time
+
+import numpy as np
+import pytest
+from qtpy import QtGui
+
+import labelme.utils
+from labelme.ai._utils import DecoderCache
+from labelme.ai._utils import output_nbytes
+from labelme.ai._utils import run_encoder
+from labelme.ai_prediction import AiPredictionScheduler
+from labelme.ai_prediction import EmbeddingPrefetcher
+from labelme.ai_prediction import model_input_image
+from labelme.ai_prediction import predict_shape
+
+
+class TriangleModel(object):
+    """Predict a triangle next to the last point."""
+
+    def __init__(self, delay=0):
+        self.delay = delay
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def predict_polygon_from_points(self, points, point_labels):
+        with self._lock:
+            self.calls.append(points)
+        time.sleep(self.delay)
+        x, y = points[-1]
+        return np.array([[x - 1, y - 1], [x + 1, y - 1], [x + 1, y + 1]])
+
+
+def test_predict_shape():
+    points, mask = predict_shape(TriangleModel(), "ai_polygon", [[5, 6]], [1])
+    assert points == [(4, 5), (6, 5), (6, 7)]
+    assert mask is None
+
+
+@pytest.mark.gui
+def test_AiPredictionScheduler(qtbot):
+    model = TriangleModel(delay=0.1)
+    scheduler = AiPredictionScheduler(delay=10)
+
+    with qtbot.waitSignal(scheduler.predicted, timeout=5000):
+        scheduler.request(model, "ai_polygon", [[1, 1], [5, 5]], [1, 1])
+    assert scheduler.result("ai_polygon", [[1, 1]], [1])[0][0] == (4, 4)
+    # not predicted from the same clicked points
+    assert scheduler.result("ai_polygon", [[2, 1]], [1]) is None
+    assert scheduler.result("ai_mask", [[1, 1]], [1]) is None
+
+    # hovering: the positions requested while predicting are dropped but the
+    # latest one
+    model.calls = []
+    for x in range(6, 16):
+        scheduler.request(model, "ai_polygon", [[1, 1], [x, 5]], [1, 1])
+        qtbot.wait(20)
+    qtbot.waitUntil(lambda: not scheduler.isBusy(), timeout=5000)
+    assert len(model.calls) < 10
+    assert model.calls[-1] == [[1, 1], [15, 5]]
+    assert scheduler.result("ai_polygon", [[1, 1]], [1])[0][0] == (14, 4)
+    # e.g. clicking where the preview was predicted
+    assert scheduler.get("ai_polygon", [[1, 1], [15, 5]], [1, 1])[0][0] == (14, 4)
+    assert scheduler.get("ai_polygon", [[1, 1], [14, 5]], [1, 1]) is None
+
+    scheduler.cancel()
+    assert scheduler.result("ai_polygon", [[1, 1]], [1]) is None
+
+
+def test_DecoderCache():
+    calls = []
+
+    def compute_mask(points, point_labels):
+        calls.append(points)
+        mask = np.zeros((10, 10), dtype=bool)
+        x, y = points[-1]
+        mask[y - 2 : y + 3, x - 2 : x + 3] = True
+        return mask
+
+    cache = DecoderCache(maxsize=2)
+    embedding = np.zeros(1)
+    mask = cache.get_mask(embedding, [[4.2, 5.1]], [1], compute_mask)
+    assert calls == [[[4, 5]]]  # decoded at the rounded points
+    # same pixels: mask and polygon are reused
+    assert cache.get_mask(embedding, [[3.9, 4.8]], [1], compute_mask) is mask
+    polygon = cache.get_polygon(embedding, [[4, 5]], [1], compute_mask)
+    assert len(calls) == 1
+    assert cache.get_polygon(embedding, [[4, 5]], [1], compute_mask) is polygon
+
+    # another image embedding or label
+    cache.get_mask(np.zeros(1), [[4, 5]], [1], compute_mask)
+    cache.get_mask(embedding, [[4, 5]], [0], compute_mask)
+    assert len(calls) == 3
+    # the least recently used entry was evicted
+    cache.get_mask(embedding, [[4, 5]], [1], compute_mask)
+    assert len(calls) == 4
+
+
+class SumEncoder(object):
+    """Fake encoder session summing the pixels of each image."""
+
+    def __init__(self, batch_size):
+        self.batch_size = batch_size
+        self.batches = []
+
+    def get_inputs(self):
+        Input = collections.namedtuple("Input", ["name", "shape"])
+        return [Input("x", [self.batch_size, 3, "height", "width"])]
+
+    def run(self, output_names, input_feed):
+        (x,) = input_feed.values()
+        self.batches.append(len(x))
+        return [x.sum(axis=(1, 2, 3))[:, None]]
+
+
+@pytest.mark.parametrize("batch_size", ["batch_size", 1])
+def test_run_encoder(batch_size):
+    inputs = [np.full((1, 3, 2, 2), i, dtype=np.float32) for i in range(3)]
+    session = SumEncoder(batch_size)
+    outputs = run_encoder(session, "x", inputs)
+    assert [output.tolist() for output in outputs] == [[[0]], [[12]], [[24]]]
+    assert session.batches == ([3] if batch_size != 1 else [1, 1, 1])
+
+    # different shapes are not batched
+    session = SumEncoder(batch_size)
+    run_encoder(session, "x", [np.zeros((1, 3, 2, 2)), np.zeros((1, 3, 4, 2))])
+    assert session.batches == [1, 1]
+
+
+def test_output_nbytes():
+    Output = collections.namedtuple("Output", ["name", "type", "shape"])
+
+    class Session(object):
+        def __init__(self, type, shape):
+            self.output = Output("image_embeddings", type, shape)
+
+        def get_outputs(self):
+            return [self.output]
+
+    # per image, whatever the batch axis
+    assert output_nbytes(Session("tensor(float)", [1, 256, 64, 64])) == 4 << 20
+    assert output_nbytes(Session("tensor(float16)", ["batch", 256, 64, 64])) == (
+        2 << 20
+    )
+    assert output_nbytes(Session("tensor(float)", [1, 256, "h", "w"])) is None
+    assert output_nbytes(Session("tensor(int64)", [1, 256, 64, 64])) is None
+
+
+class PrefetchModel(object):
+    def __init__(self):
+        self.images = []
+
+    def prefetch_image_embedding(self, image):
+        self.images.append(image)
+
+
+@pytest.mark.gui
+def test_EmbeddingPrefetcher(qtbot):
+    arrays = {}
+    for i, color in enumerate([(255, 0, 0), (0, 255, 0), (0, 0, 255)]):
+        arrays["%d.png" % i] = np.full((4, 5, 3), color, dtype=np.uint8)
+
+    def imageDataOf(filename):
+        if filename not in arrays:
+            raise IOError(filename)
+        return labelme.utils.img_arr_to_data(arrays[filename])
+
+    model = PrefetchModel()
+    prefetcher = EmbeddingPrefetcher(imageDataOf=imageDataOf)
+    prefetcher.prefetch(model, ["2.png", "missing.png", "0.png"])
+    assert prefetcher.wait(5000)
+    assert len(model.images) == 2
+    for image, filename in zip(model.images, ["2.png", "0.png"]):
+        # the same array as the one of the shown image
+        qimage = QtGui.QImage.fromData(imageDataOf(filename))
+        np.testing.assert_array_equal(image, model_input_image(qimage))
+        np.testing.assert_array_equal(image[:, :, :3], arrays[filename])
@@ -0,0 +1,299 @@
+import json
+import os.path as osp
+import random
+import shutil
+
+import numpy as np
+import PIL.Image
+import pytest
+from qtpy import QtGui
+
+import labelme.utils
+from labelme.check import PREVIEW_SIZE
+from labelme.check import AnimatedDisplay
+from labelme.check import build_covt_seq
+from labelme.check import covt_row_keys
+from labelme.check import load_covt_case
+from labelme.check import mask_to_image
+from labelme.check import render_covt_rows
+from labelme.check import resize_covt_seq
+from labelme.check import resize_image
+from labelme.check import validate_covt_case
+from labelme.cli.covt_check import iter_case_dirs
+from labelme.cli.covt_check import validate_case
+
+here = osp.dirname(osp.abspath(__file__))
+data_dir = osp.join(here, "data")
+
+
+def _make_case(tmp_path, shapes, flags):
+    case_dir = tmp_path / "p10" / "p10000032" / "s50414267"
+    case_dir.mkdir(parents=True)
+    with open(osp.join(data_dir, "annotated_with_data/apc2016_obj3.json")) as f:
+        data = json.load(f)
+    data["shapes"] = shapes
+    data["flags"] = flags
+    with open(case_dir / "view1.json", "w") as f:
+        json.dump(data, f)
+    shutil.copy(osp.join(data_dir, "raw/2011_000003.jpg"), case_dir / "view1.jpg")
+    return str(case_dir)
+
+
+def _shape(label, shape_type, points, description, flags):
+    return dict(
+        label=label,
+        points=points,
+        shape_type=shape_type,
+        description=description,
+        flags=flags,
+        group_id=None,
+        mask=None,
+    )
+
+
+def test_validate_covt_case(tmp_path):
+    shapes = [
+        _shape("1", "polygon", [[1, 1], [9, 1], [9, 9]], "heart.", {"Heart.": True}),
+        _shape("unknown", "polygon", [[1, 1], [9, 1]], "x", {"Heart.": True}),
+        _shape("0_0", "polygon", [[1, 1], [9, 9]], None, {"Lungs": True}),
+        _shape("2", "polygon", [[1, 1]], "lungs", {"Lungs": True}),
+    ]
+    case_dir = _make_case(tmp_path, shapes, ["Heart.", "Effusion"])
+
+    case = load_covt_case(case_dir, decode_images=False)
+    assert case[0]["image"] is None
+    log_content = []
+    view_shapes = validate_covt_case(case, log_content)
+
+    assert [s["label"] for s in view_shapes[0]] == ["1"]
+    assert "出现了未知标签:unknown" in log_content
+    assert "0_0的标注类别为polygon, 与期望的rectangle不匹配" in log_content
+    assert "0_0的description为空,请补上" in log_content
+    assert "2不是点标签，但是所获取的坐标点却只有一个" in log_content
+    assert "原报告 Effusion未标注，如果是正常修改报告引起的请忽略" in log_content
+
+
+def test_covt_check_cli_helpers(tmp_path):
+    shapes = [_shape("1", "polygon", [[1, 1], [9, 1], [9, 9]], "heart", {"A": True})]
+    case_dir = _make_case(tmp_path, shapes, ["A"])
+
+    assert list(iter_case_dirs(str(tmp_path))) == [case_dir]
+    assert list(iter_case_dirs(str(tmp_path), since=2**40)) == []
+
+    result = validate_case(case_dir)
+    assert result["views"] == ["view1.json"]
+    assert result["warnings"] == []
+
+    # JSON files other than label files are skipped
+    with open(osp.join(case_dir, "report.json"), "w") as f:
+        json.dump(["Heart."], f)
+    result = validate_case(case_dir)
+    assert "error" not in result
+    assert result["views"] == ["view1.json"]
+    other_dir = tmp_path / "p10" / "p10000032" / "reports"
+    other_dir.mkdir()
+    with open(other_dir / "report.json", "w") as f:
+        json.dump({"findings": "Heart."}, f)
+    assert validate_case(str(other_dir)) is None
+
+
+@pytest.mark.gui
+def test_AnimatedDisplay_clear_while_rendering(qtbot, tmp_path):
+    shapes = [
+        _shape("1", "polygon", [[1, 1], [9, 1], [9, 9]], "heart.", {"Heart.": True})
+    ]
+    case_dir = _make_case(tmp_path, shapes, ["Heart."])
+
+    display = AnimatedDisplay()
+    qtbot.addWidget(display)
+    display.request_update(case_dir)
+    qtbot.waitUntil(lambda: len(display.row_widgets) == 2, timeout=10000)
+
+    # the rows the request reuses are deleted before it finishes
+    display.request_update(case_dir)
+    display.clear_layout(display.scroll_area_layout)
+    assert display._render_pool.waitForDone(10000)
+    qtbot.wait(50)
+    assert display.row_widgets == {}
+
+
+def _synthetic_case():
+    rng = np.random.RandomState(0)
+    views = []
+    for i, shapes in enumerate(
+        [
+            [
+                _shape(
+                    "0_1",
+                    "polygon",
+                    [[20, 20], [120, 30], [60, 110]],
+                    "a.",
+                    {"A": True},
+                ),
+                _shape("0_0", "rectangle", [[100, 60], [180, 140]], "a.", {"A": True}),
+                _shape("3_3", "line", [[10, 150], [190, 100]], "b", {"A": True}),
+                _shape("2", "point", [[150, 40]], "c", {"B": True}),
+            ],
+            [_shape("0_0", "rectangle", [[40, 20], [160, 100]], "d", {"B": True})],
+        ]
+    ):
+        image = rng.randint(0, 256, size=(160, 200, 3), dtype=np.uint8)
+        views.append(
+            dict(
+                name="view%d.json" % i,
+                image=PIL.Image.fromarray(image),
+                image_key=i,
+                size=(200, 160),
+                flags=["A", "B"],
+                shapes=shapes,
+            )
+        )
+    return views
+
+
+def _reference_rows(covt_seq):
+    """The rendering before the rewrite: full resolution masks resized as images
+    and blended with float arithmetic."""
+    base_images = [
+        np.array(resize_image(views[0], *PREVIEW_SIZE).convert("RGBA"))
+        for views in covt_seq[0][:-1]
+    ]
+    rows = []
+    for item in covt_seq[1:]:
+        row = []
+        for base_image, steps in zip(base_images, item[:-1]):
+            image = base_image
+            for step in steps:
+                if isinstance(step, str):
+                    continue
+                data = np.array(
+                    resize_image(mask_to_image(step), *PREVIEW_SIZE).convert("RGBA")
+                )
+                color = [random.randint(0, 255) for _ in range(3)] + [128]
+                selected = data[:, :, 0] > 250
+                image = image.copy()
+                image[selected] = (
+                    np.uint8(image[selected] * 0.7) + np.uint8(color) * 0.3
+                )
+                row.append(image)
+        rows.append(row)
+    return rows
+
+
+def _row_images(row):
+    return [
+        labelme.utils.img_qt_to_arr(item)
+        for item, _ in row
+        if isinstance(item, QtGui.QImage)
+    ]
+
+
+def test_build_covt_seq_masks():
+    case = _synthetic_case()
+    log_content = []
+    covt_seq = build_covt_seq(case, log_content)
+    assert log_content == []
+
+    # row 'A' of the first view: consecutive shapes of a description are merged
+    steps = covt_seq[1][0]
+    assert steps[1::2] == ["a", "b"]
+    expected = PIL.Image.new("L", (200, 160), 0)
+    draw = PIL.ImageDraw.Draw(expected)
+    draw.polygon([(20, 20), (120, 30), (60, 110)], fill=255)
+    draw.rectangle([100, 60, 180, 140], fill=255)
+    np.testing.assert_array_equal(steps[0], np.asarray(expected) > 0)
+    assert covt_seq[1][2] == "Findings: A"
+
+
+def test_render_covt_rows_as_before():
+    covt_seq = build_covt_seq(_synthetic_case(), [])
+
+    random.seed(0)
+    rows = render_covt_rows(resize_covt_seq(covt_seq))
+    random.seed(0)
+    expected_rows = _reference_rows(covt_seq)
+
+    assert len(rows) == 3
+    assert [text for text, is_report in rows[0] if is_report] == [
+        "Original chest x-ray images obtained"
+    ]
+    for row, expected_row in zip(rows[1:], expected_rows):
+        images = _row_images(row)
+        assert len(images) == len(expected_row)
+        for image, expected in zip(images, expected_row):
+            # integer blending differs from the float one by rounding only
+            diff = np.abs(image.astype(int) - expected.astype(int))
+            assert diff.max() <= 1
+
+
+def test_build_covt_seq_max_size():
+    case = _synthetic_case()
+    full_seq = build_covt_seq(case, [])
+    preview_seq = build_covt_seq(case, [], max_size=(100, 100))
+
+    assert preview_seq[0][0][0].size == (100, 80)
+    for full_item, preview_item in zip(full_seq[1:], preview_seq[1:]):
+        for full_steps, preview_steps in zip(full_item[:-1], preview_item[:-1]):
+            assert full_steps[1::2] == preview_steps[1::2]
+            for full_mask, mask in zip(full_steps[::2], preview_steps[::2]):
+                assert mask.shape == (80, 100)
+                # the shapes are drawn where the downscaled ones are
+                expected = (
+                    np.asarray(
+                        mask_to_image(full_mask).resize((100, 80), PIL.Image.NEAREST)
+                    )
+                    > 0
+                )
+                bbox = np.r_[np.argwhere(mask).min(0), np.argwhere(mask).max(0)]
+                expected_bbox = np.r_[
+                    np.argwhere(expected).min(0), np.argwhere(expected).max(0)
+                ]
+                assert np.abs(bbox - expected_bbox).max() <= 1
+                assert abs(mask.sum() / expected.sum() - 1) < 0.15
+
+
+def test_covt_row_keys():
+    case = _synthetic_case()
+    keys = covt_row_keys(case)
+    assert len(keys) == 3
+
+    case[1]["shapes"][0]["points"] = [[40, 20], [150, 100]]
+    changed_keys = covt_row_keys(case)
+    assert changed_keys[:2] == keys[:2]
+    assert changed_keys[2] != keys[2]
+
+    case[0]["image_key"] = "other"
+    assert not set(covt_row_keys(case)) & set(keys)
+
+
+@pytest.mark.gui
+def test_AnimatedDisplay_request_update(qtbot, tmp_path):
+    shapes = [
+        _shape("0_1", "polygon", [[1, 1], [90, 1], [90, 90]], "heart", {"A": True}),
+        _shape("0_1", "polygon", [[10, 10], [60, 10], [60, 60]], "lungs", {"B": True}),
+    ]
+    case_dir = _make_case(tmp_path, shapes, ["A", "B"])
+
+    display = AnimatedDisplay()
+    qtbot.addWidget(display)
+    display.request_update(case_dir)
+    qtbot.waitUntil(lambda: len(display.row_widgets) == 3, timeout=10000)
+    widgets = {key: row_widget for key, (row_widget, _) in display.row_widgets.items()}
+
+    # e.g. saving after editing the shape of 'B'
+    json_file = osp.join(case_dir, "view1.json")
+    with open(json_file) as f:
+        data = json.load(f)
+    data["shapes"][1]["points"] = [[20, 20], [70, 20], [70, 70]]
+    with open(json_file, "w") as f:
+        json.dump(data, f)
+    new_keys = covt_row_keys(load_covt_case(case_dir, decode_images=False))
+    assert new_keys[:2] == display.row_keys[:2]
+
+    display.request_update(case_dir)
+    qtbot.waitUntil(lambda: display.row_keys == new_keys, timeout=10000)
+    # the unchanged rows are reused, the changed one is rebuilt
+    for key in new_keys[:2]:
+        assert display.row_widgets[key][0] is widgets[key]
+    assert new_keys[2] not in widgets
+    assert display.row_widgets[new_keys[2]][0] not in widgets.values()
@@ -0,0 +1,109 @@
+import os
+import threading
+
+import numpy as np
+import pytest
+
+from labelme.ai.embedding_cache import EmbeddingCache
+from labelme.ai.embedding_cache import image_key
+
+
+def test_image_key():
+    image = np.arange(2 * 3 * 3, dtype=np.uint8).reshape(2, 3, 3)
+    assert image_key(image) == image_key(image.copy())
+    assert image_key(image) != image_key(image.reshape(3, 2, 3))
+    other = image.copy()
+    other[0, 0, 0] = 255
+    assert image_key(image) != image_key(other)
+    # not contiguous
+    assert image_key(image[:, ::-1]) == image_key(image[:, ::-1].copy())
+
+
+def test_EmbeddingCache(tmp_path):
+    embeddings = [np.full((1, 4, 8, 8), i, dtype=np.float32) for i in range(3)]
+    size = embeddings[0].nbytes + 128  # with the .npy header
+
+    cache = EmbeddingCache("model", cache_dir=str(tmp_path), memory_size=1)
+    assert cache.get("a") is None
+    cache.put("a", embeddings[0])
+    cache.put("b", embeddings[1])
+    assert "a" in cache
+    np.testing.assert_array_equal(cache.get("a"), embeddings[0])  # from disk
+
+    # persisted across sessions, the least recently used file is removed first
+    cache = EmbeddingCache(
+        "model", cache_dir=str(tmp_path), memory_size=1, max_bytes=2 * size
+    )
+    past = os.stat(tmp_path / "model" / "a.npy").st_mtime - 10
+    os.utime(tmp_path / "model" / "b.npy", (past, past))
+    np.testing.assert_array_equal(cache.get("b"), embeddings[1])
+    cache.put("c", embeddings[2])
+    assert sorted(os.listdir(tmp_path / "model")) == ["b.npy", "c.npy"]
+    assert cache.get("a") is None
+
+    # other model
+    assert EmbeddingCache("other", cache_dir=str(tmp_path)).get("b") is None
+
+
+def test_EmbeddingCache_get_or_compute(tmp_path):
+    cache = EmbeddingCache("model", cache_dir=str(tmp_path))
+    embedding = np.ones((1, 4, 8, 8), dtype=np.float32)
+    started = threading.Event()
+    release = threading.Event()
+    computed = []
+
+    def compute():
+        computed.append(threading.current_thread())
+        started.set()
+        assert release.wait(5)
+        return embedding
+
+    # e.g. a prefetch of the image being set
+    prefetch = threading.Thread(target=cache.get_or_compute, args=("a", compute))
+    prefetch.start()
+    assert started.wait(5)
+    results = []
+    waiter = threading.Thread(
+        target=lambda: results.append(cache.get_or_compute("a", compute))
+    )
+    waiter.start()
+    waiter.join(0.1)
+    assert waiter.is_alive()  # waits for the prefetch
+    release.set()
+    prefetch.join(5)
+    waiter.join(5)
+    assert computed == [prefetch]
+    assert results[0] is embedding
+
+    # a failed computation is computed again
+    def fail():
+        raise RuntimeError("failed")
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_compute("b", fail)
+    assert cache.get_or_compute("b", lambda: embedding) is embedding
+    assert cache.get_or_compute("b", fail) is embedding
+
+
+def test_EmbeddingCache_trim(tmp_path, monkeypatch):
+    embedding = np.zeros((1, 4, 8, 8), dtype=np.float32)
+    size = embedding.nbytes + 128  # with the .npy header
+    cache = EmbeddingCache("model", cache_dir=str(tmp_path), max_bytes=3 * size)
+    cache.put("a", embedding)
+
+    trims = []
+    trim = cache._trim
+
+    def counting_trim():
+        trims.append(1)
+        trim()
+
+    monkeypatch.setattr(cache, "_trim", counting_trim)
+    # the directory is scanned again only when it exceeds max_bytes
+    cache.put("a", embedding)
+    for key in "bc":
+        cache.put(key, embedding)
+    assert trims == []
+    cache.put("d", embedding)
+    assert trims == [1]
+    assert len(os.listdir(tmp_path / "model")) == 3
@@ -0,0 +1,42 @@
+import os.path as osp
+
+from labelme.file_search import FileSearchIndex
+from labelme.file_search import search_predicate
+
+
+def test_FileSearchIndex():
+    paths = [
+        osp.join("/data", "files", "p10", "p10000032", "s50414267", "a.jpg"),
+        osp.join("/data", "files", "p10", "p10000032", "s53189527", "b.jpg"),
+        osp.join("/data", "files", "p11", "p11000011", "s51000011", "c.jpg"),
+        osp.join("/data", "files", "p11", "p11000011", "s51000011", "胸片.jpg"),
+    ]
+    index = FileSearchIndex(paths)
+    patterns = [
+        "",
+        "p10",
+        "p1000003",
+        "s5",
+        "s51000011",
+        "/p1",  # starts in the common directory
+        "files/p11",
+        "data",
+        "胸",
+        "zzz",
+        "p1.*c",
+        r"\.jpg$",
+        "[",  # invalid regex
+    ]
+    for pattern in patterns:
+        predicate = search_predicate(pattern)
+        expected = (
+            None
+            if predicate is None
+            else [i for i, path in enumerate(paths) if predicate(path)]
+        )
+        assert index.search(pattern) == expected, pattern
+
+    # narrowing the previous query
+    assert index.search("p1100") == [2, 3]
+    assert index.search("p11000011/s5") == [2, 3]
+    assert index.search("p11000011/s6") == []
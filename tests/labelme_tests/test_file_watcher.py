@@ -0,0 +1,48 @@
+import os
+import time
+
+import pytest
+
+import labelme.file_watcher
+from labelme.file_watcher import DirectoryWatcher
+
+
+@pytest.mark.gui
+@pytest.mark.parametrize("maxWatches", [65536, 0])
+def test_DirectoryWatcher(qtbot, tmp_path, maxWatches):
+    # maxWatches=0 polls every directory
+    watcher = DirectoryWatcher(maxWatches=maxWatches, pollInterval=50)
+    (tmp_path / "a").mkdir()
+    watcher.setDirectories([str(tmp_path / "a"), str(tmp_path)])
+    assert watcher.directories() == {str(tmp_path / "a"), str(tmp_path)}
+    qtbot.wait(200)  # let polling record the mtimes
+
+    with qtbot.waitSignal(watcher.directoriesChanged, timeout=5000) as blocker:
+        (tmp_path / "a" / "1.jpg").touch()
+    assert blocker.args == [[str(tmp_path / "a")]]
+
+    watcher.clear()
+    assert watcher.directories() == set()
+
+
+@pytest.mark.gui
+def test_DirectoryWatcher_poll_in_background(qtbot, tmp_path, monkeypatch):
+    def slowStat(path):
+        time.sleep(0.2)  # e.g. a network share
+        return os.stat(path)
+
+    monkeypatch.setattr(labelme.file_watcher, "_stat", slowStat)
+    watcher = DirectoryWatcher(maxWatches=0, pollInterval=10000)
+    watcher.setDirectories([str(tmp_path)])
+
+    t_start = time.monotonic()
+    watcher._poll()
+    watcher._poll()  # the first poll is still running
+    assert time.monotonic() - t_start < 0.1
+    assert watcher.waitForPoll(5000)
+    qtbot.wait(10)
+
+    (tmp_path / "1.jpg").touch()
+    with qtbot.waitSignal(watcher.directoriesChanged, timeout=5000) as blocker:
+        watcher._poll()
+    assert blocker.args == [[str(tmp_path)]]
@@ -0,0 +1,184 @@
+import datetime
+import io
+import json
+import os.path as osp
+import shutil
+
+import numpy as np
+import PIL.Image
+import pytest
+
+from labelme import label_file as label_file_module
+from labelme.label_file import LabelFile
+
+here = osp.dirname(osp.abspath(__file__))
+data_dir = osp.join(here, "data")
+
+
+def test_LabelFile_lazy(monkeypatch, tmp_path):
+    json_file = osp.join(data_dir, "annotated_with_data/apc2016_obj3.json")
+    label_file = LabelFile(json_file)
+
+    with monkeypatch.context() as m:
+        # no pixel is decoded until imageData is accessed
+        m.setattr(PIL.Image.Image, "load", lambda self: 1 / 0)
+        lazy_label_file = LabelFile(json_file, lazy=True)
+    assert lazy_label_file.shapes == label_file.shapes
+    assert lazy_label_file.flags == label_file.flags
+    assert lazy_label_file.imageHeight == label_file.imageHeight
+    assert lazy_label_file.imageWidth == label_file.imageWidth
+
+    assert lazy_label_file.imageData == label_file.imageData
+
+    # without imageHeight and imageWidth, they are read from the image header
+    with open(json_file) as f:
+        data = json.load(f)
+    del data["imageHeight"], data["imageWidth"]
+    json_file = str(tmp_path / "apc2016_obj3.json")
+    with open(json_file, "w") as f:
+        json.dump(data, f)
+    with monkeypatch.context() as m:
+        m.setattr(PIL.Image.Image, "load", lambda self: 1 / 0)
+        lazy_label_file = LabelFile(json_file, lazy=True)
+    assert lazy_label_file.imageHeight == label_file.imageHeight
+    assert lazy_label_file.imageWidth == label_file.imageWidth
+
+
+def test_LabelFile_save_without_decoding(monkeypatch, tmp_path):
+    json_file = osp.join(data_dir, "annotated_with_data/apc2016_obj3.json")
+    label_file = LabelFile(json_file)
+
+    json_file = str(tmp_path / "apc2016_obj3.json")
+    with monkeypatch.context() as m:
+        # the image size is checked from the header only
+        m.setattr(PIL.Image.Image, "load", lambda self: 1 / 0)
+        label_file.save(
+            json_file,
+            shapes=label_file.shapes,
+            imagePath=label_file.imagePath,
+            imageHeight=label_file.imageHeight + 1,
+            imageWidth=label_file.imageWidth,
+            imageData=label_file.imageData,
+        )
+    with open(json_file) as f:
+        data = json.load(f)
+    assert data["imageHeight"] == label_file.imageHeight
+    assert data["imageWidth"] == label_file.imageWidth
+
+
+def test_LabelFile_load_image_file(tmp_path):
+    image_file = osp.join(data_dir, "annotated_with_data/apc2016_obj3.jpg")
+    with open(image_file, "rb") as f:
+        image_data = f.read()
+    # without exif orientation, the file is returned as is
+    assert LabelFile.load_image_file(image_file) == image_data
+
+    with PIL.Image.open(image_file) as image_pil:
+        width, height = image_pil.size
+        exif = image_pil.getexif()
+        exif[0x0112] = 6  # Orientation: rotate 270
+        image_file = str(tmp_path / "rotated.jpg")
+        image_pil.save(image_file, exif=exif)
+    image_data = LabelFile.load_image_file(image_file)
+    with PIL.Image.open(io.BytesIO(image_data)) as image_pil:
+        assert image_pil.format == "JPEG"
+        assert image_pil.size == (height, width)
+
+
+def test_LabelFile_load_shown_image_data(tmp_path):
+    image_file = str(tmp_path / "images" / "apc2016_obj3.jpg")
+    assert LabelFile.get_label_file(image_file) == str(
+        tmp_path / "images" / "apc2016_obj3.json"
+    )
+    assert LabelFile.get_label_file(image_file, str(tmp_path / "out")) == str(
+        tmp_path / "out" / "apc2016_obj3.json"
+    )
+
+    # the image file without a label file
+    (tmp_path / "images").mkdir()
+    PIL.Image.new("RGB", (4, 3)).save(image_file)
+    assert LabelFile.load_shown_image_data(image_file) == (
+        LabelFile.load_image_file(image_file)
+    )
+
+    # the image embedded in the label file in output_dir
+    json_file = osp.join(data_dir, "annotated_with_data/apc2016_obj3.json")
+    (tmp_path / "out").mkdir()
+    shutil.copy(json_file, str(tmp_path / "out"))
+    assert LabelFile.load_shown_image_data(image_file, str(tmp_path / "out")) == (
+        LabelFile(json_file).imageData
+    )
+
+
+def test_LabelFile_sidecar(tmp_path):
+    json_file = osp.join(data_dir, "annotated_with_data/apc2016_obj3.json")
+    label_file = LabelFile(json_file)
+
+    json_file = str(tmp_path / "apc2016_obj3.json")
+    label_file.save(
+        json_file,
+        shapes=label_file.shapes,
+        imagePath=label_file.imagePath,
+        imageHeight=label_file.imageHeight,
+        imageWidth=label_file.imageWidth,
+        imageData=label_file.imageData,
+        imageDataStore="sidecar",
+    )
+    with open(json_file) as f:
+        data = json.load(f)
+    assert data["imageData"] is None
+    assert (tmp_path / ".labelme" / "objects" / data["imageDataRef"]).is_file()
+
+    for lazy in [False, True]:
+        sidecar_label_file = LabelFile(json_file, lazy=lazy)
+        assert "imageDataRef" not in sidecar_label_file.otherData
+        assert sidecar_label_file.imageHeight == label_file.imageHeight
+        assert sidecar_label_file.imageData == label_file.imageData
+
+
+@pytest.mark.parametrize("backend", ["orjson", "ujson", "json"])
+def test_json_backend(backend):
+    try:
+        label_file_module.set_json_backend(backend)
+    except ImportError:
+        pytest.skip("{} is not installed".format(backend))
+    try:
+        json_file = osp.join(data_dir, "annotated_with_data/apc2016_obj3.json")
+        data = label_file_module.load_json(json_file)
+        with open(json_file, encoding="utf-8") as f:
+            assert data == json.load(f)
+
+        data["flags"] = {"标注": True, "/path": False}
+        data["shapes"][0]["points"] = [(0.1, 2), (3.5, 1234.5678)]
+        expected = json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8")
+        # written by the backend itself, not by the fallback
+        assert label_file_module._json_dumps(data) == expected
+        assert label_file_module.json_dumps(data) == expected
+        assert label_file_module.json_loads(expected) == json.loads(expected)
+
+        # only the exponents may be formatted differently
+        data["shapes"][0]["points"] = [(1e-7, 1e16), (-2.5e-300, 6.02e23)]
+        dumped = label_file_module.json_dumps(data)
+        assert json.loads(dumped) == json.loads(json.dumps(data))
+    finally:
+        label_file_module.set_json_backend()
+
+
+@pytest.mark.parametrize("backend", ["orjson", "ujson", "json"])
+def test_json_backend_fallback(backend):
+    try:
+        label_file_module.set_json_backend(backend)
+    except ImportError:
+        pytest.skip("{} is not installed".format(backend))
+    try:
+        # written by the stdlib when the backend cannot
+        for value in [1 << 70, float("nan"), float("inf"), [[1.0, float("-inf")]]]:
+            data = {"shapes": [{"points": value}]}
+            expected = json.dumps(data, ensure_ascii=False, indent=2)
+            assert label_file_module.json_dumps(data) == expected.encode("utf-8")
+        # and rejected by every backend when the stdlib cannot
+        for value in [np.zeros(2), np.float32(1), datetime.date(2020, 1, 1)]:
+            with pytest.raises(TypeError):
+                label_file_module.json_dumps({"value": value})
+    finally:
+        label_file_module.set_json_backend()
@@ -0,0 +1,45 @@
+import threading
+
+import pytest
+
+from labelme.label_writer import LabelFileWriter
+from labelme.utils import atomic_write
+
+
+@pytest.mark.gui
+def test_LabelFileWriter(qtbot, tmp_path):
+    writer = LabelFileWriter()
+    a = str(tmp_path / "a.json")
+    b = str(tmp_path / "b.json")
+
+    written = []
+    blocked = threading.Event()
+
+    def write(filename, data):
+        blocked.wait(5)
+        atomic_write(filename, data)
+        written.append((filename, data))
+
+    with qtbot.waitSignals([writer.saved] * 2, timeout=5000):
+        writer.submit(a, lambda: write(a, b"1"))
+        qtbot.wait(50)  # a=1 is being written
+        assert writer.isPending(a)
+        writer.submit(a, lambda: write(a, b"2"))
+        writer.submit(b, lambda: write(b, b"1"))
+        # only the latest state of a is written, after a=1 finishes
+        writer.submit(a, lambda: write(a, b"3"))
+        writer.submit(a, lambda: write(a, b"4"), replace=False)
+        blocked.set()
+        assert writer.wait(a, timeout=5)
+    assert writer.flush(timeout=5)
+    assert written == [(a, b"1"), (a, b"3"), (a, b"4"), (b, b"1")]
+    assert (tmp_path / "a.json").read_bytes() == b"4"
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["a.json", "b.json"]
+
+    def fail():
+        raise OSError("disk full")
+
+    with qtbot.waitSignal(writer.failed, timeout=5000) as blocker:
+        writer.submit(a, fail)
+    assert blocker.args[0] == a
+    assert (tmp_path / "a.json").read_bytes() == b"4"
@@ -0,0 +1,85 @@
+import json
+import os
+
+import pytest
+
+from labelme.report_index import ReportIndex
+from labelme.report_index import _iter_json_array
+from labelme.report_index import iter_report_items
+from labelme.report_index import report_key
+
+
+def _write_report(filename, items):
+    with open(filename, "w") as f:
+        json.dump(
+            [dict(ref_img=ref_img, content=content) for ref_img, content in items], f
+        )
+
+
+def test_report_key():
+    assert report_key("\\p10\\p10000032\\s50414267") == "p10-p10000032-s50414267"
+
+
+def test_ReportIndex(tmp_path, monkeypatch):
+    report_json = str(tmp_path / "report.json")
+    cache_dir = str(tmp_path / "cache")
+    _write_report(report_json, [("\\p10\\p10000032\\s50414267", "No effusion.")])
+
+    index = ReportIndex(report_json, cache_dir=cache_dir)
+    assert len(index) == 1
+    assert "p10-p10000032-s50414267" in index
+    assert index["p10-p10000032-s50414267"] == "No effusion."
+    assert index.get("p10-p10000032-s0") is None
+    index.close()
+
+    # touching the report keeps the index as the content is the same
+    os.utime(report_json, ns=(0, 0))
+    with monkeypatch.context() as m:
+        m.setattr(ReportIndex, "build", lambda self, **kwargs: pytest.fail("rebuilt"))
+        index = ReportIndex(report_json, cache_dir=cache_dir)
+        assert index["p10-p10000032-s50414267"] == "No effusion."
+        index.close()
+
+    # changing the report rebuilds the index
+    _write_report(report_json, [("\\p10\\p10000032\\s50414267", "Small effusion.")])
+    index = ReportIndex(report_json, cache_dir=cache_dir)
+    assert index["p10-p10000032-s50414267"] == "Small effusion."
+    index.close()
+
+    # a broken index is rebuilt
+    with open(index.index_file, "wb") as f:
+        f.write(b"not an index" * 100)
+    index = ReportIndex(report_json, cache_dir=cache_dir)
+    assert index["p10-p10000032-s50414267"] == "Small effusion."
+    index.close()
+
+
+def test_iter_json_array(tmp_path):
+    data = [
+        dict(ref_img="\\p10\\p1", content='[1, 2], "quoted" {braces}'),
+        dict(ref_img="\\p10\\p2", content="\u80ba\u90e8 \u2014 no \\ effusion"),
+        dict(ref_img="\\p10\\p3", content=" " * 100),
+    ]
+    filename = tmp_path / "report.json"
+    filename.write_text(json.dumps(data, ensure_ascii=False, indent=2), "utf-8")
+
+    # tiny chunks split items, escapes and multi-byte characters
+    for chunk_size in [1, 3, 7, 1 << 20]:
+        with open(filename, "rb") as f:
+            assert list(_iter_json_array(f, chunk_size=chunk_size)) == data
+
+    progress = []
+    items = list(
+        iter_report_items(str(filename), progress=lambda *args: progress.append(args))
+    )
+    assert items == [(report_key(d["ref_img"]), d["content"]) for d in data]
+    assert progress[-1] == (filename.stat().st_size,) * 2
+
+    filename.write_text("[]")
+    with open(filename, "rb") as f:
+        assert list(_iter_json_array(f, chunk_size=1)) == []
+
+    filename.write_text('[{"a": 1}')
+    with open(filename, "rb") as f:
+        with pytest.raises(ValueError):
+            list(_iter_json_array(f, chunk_size=4))
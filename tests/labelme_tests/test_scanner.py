@@ -0,0 +1,44 @@
+import os.path as osp
+
+from labelme.scanner import case_index
+from labelme.scanner import case_index_from_path
+from labelme.scanner import scan_images
+
+
+def test_case_index():
+    assert case_index("p10000032", "s50414267") == "p10-p10000032-s50414267"
+    assert case_index("files", "p10-p10000032-s50414267") == (
+        "p10-p10-p10000032-s50414267"
+    )
+    assert (
+        case_index_from_path(osp.join("p10", "p10000032", "s50414267", "a.jpg"))
+        == "p10-p10000032-s50414267"
+    )
+
+
+def test_scan_images(tmp_path):
+    files = [
+        "p10/p10000032/s50414267/b.JPG",
+        "p10/p10000032/s50414267/a10.jpg",
+        "p10/p10000032/s50414267/a2.jpg",
+        "p10/p10000032/s50414267/a2.json",
+        "p10/p10000032/s59999999/a.jpg",
+        "p11/p11000011/s51000011/a.png",
+    ]
+    for f in files:
+        filename = tmp_path / "files" / f
+        filename.parent.mkdir(parents=True, exist_ok=True)
+        filename.touch()
+    root = str(tmp_path / "files")
+
+    def join(f):
+        return osp.join(root, *f.split("/"))
+
+    cases = {"p10-p10000032-s50414267", "p11-p11000011-s51000011"}
+    for workers in [None, 4]:
+        assert scan_images(root, {".jpg", ".png"}, workers=workers) == [
+            join(files[i]) for i in [2, 1, 0, 4, 5]
+        ]
+        assert scan_images(
+            root, {".jpg", ".png"}, case_filter=cases.__contains__, workers=workers
+        ) == [join(files[i]) for i in [2, 1, 0, 5]]
@@ -0,0 +1,139 @@
+import os.path as osp
+import random
+
+import pytest
+from qtpy.QtCore import Qt
+
+from labelme.widgets import FileListWidget
+
+
+@pytest.mark.gui
+def test_FileListWidget(qtbot, tmp_path):
+    paths = [str(tmp_path / "{}.jpg".format(i)) for i in range(5)]
+    (tmp_path / "1.json").touch()
+
+    def labelFileOf(path):
+        return osp.splitext(path)[0] + ".json"
+
+    widget = FileListWidget(labelFileOf=labelFileOf)
+    qtbot.addWidget(widget)
+    model = widget.model()
+
+    widget.setPaths(paths + paths[:1])
+    assert len(widget) == 5
+    assert widget.paths() == paths
+    assert widget.row(paths[3]) == 3
+    assert widget.row("9.jpg") == -1
+    assert paths[3] in widget
+
+    # check states are filled in by the background scan
+    qtbot.waitUntil(
+        lambda: all(
+            model.data(model.index(row), Qt.CheckStateRole) != Qt.PartiallyChecked
+            for row in range(len(widget))
+        )
+    )
+    assert [model.checkState(row) for row in range(len(widget))] == [
+        Qt.Unchecked,
+        Qt.Checked,
+        Qt.Unchecked,
+        Qt.Unchecked,
+        Qt.Unchecked,
+    ]
+
+    widget.setCheckState(paths[2], Qt.Checked)
+    assert model.checkState(2) == Qt.Checked
+
+    new_path = str(tmp_path / "5.jpg")
+    (tmp_path / "5.json").touch()
+    widget.addPaths([paths[4], new_path])
+    assert widget.paths() == paths + [new_path]
+    assert widget.row(new_path) == 5
+    qtbot.waitUntil(lambda: model.checkState(5) == Qt.Checked)
+
+    with qtbot.waitSignal(widget.itemSelectionChanged):
+        widget.setCurrentRow(2)
+    assert widget.currentRow() == 2
+    assert widget.selectedPaths() == [paths[2]]
+
+    widget.clear()
+    assert len(widget) == 0
+    model.waitForScan()
+
+
+@pytest.mark.gui
+def test_FileListModel_update(qtbot):
+    widget = FileListWidget()
+    qtbot.addWidget(widget)
+    model = widget.model()
+
+    widget.setPaths(["a/1.jpg", "a/3.jpg", "b/1.jpg"])
+    model.insertPaths(["a/2.jpg", "a/10.jpg"], key=lambda p: (p[0], int(p[2:-4])))
+    assert widget.paths() == ["a/1.jpg", "a/2.jpg", "a/3.jpg", "a/10.jpg", "b/1.jpg"]
+    assert model.pathsInDir("a") == {"a/1.jpg", "a/2.jpg", "a/3.jpg", "a/10.jpg"}
+    assert sorted(model.pathsWithStem("1")) == ["a/1.jpg", "b/1.jpg"]
+    assert model.pathsWithStem("10") == ["a/10.jpg"]
+
+    model.removePaths(["a/2.jpg", "a/3.jpg", "b/1.jpg", "c/1.jpg"])
+    assert widget.paths() == ["a/1.jpg", "a/10.jpg"]
+    assert widget.row("a/10.jpg") == 1
+    assert model.pathsWithStem("1") == ["a/1.jpg"]
+    assert "b" not in model.dirs()
+
+    widget.setCurrentRow(1)
+    widget.setFilter(lambda p: p.endswith("10.jpg"))
+    assert widget.paths() == ["a/10.jpg"]
+    assert widget.selectedPaths() == ["a/10.jpg"]
+    assert model.allPaths() == ["a/1.jpg", "a/10.jpg"]
+    widget.setFilter(None)
+    assert widget.paths() == ["a/1.jpg", "a/10.jpg"]
+
+    widget.setSearchPattern("a/1")
+    assert widget.paths() == ["a/1.jpg", "a/10.jpg"]
+    widget.setSearchPattern("a/10")
+    assert widget.paths() == ["a/10.jpg"]
+    # paths added later are filtered too
+    model.insertPaths(["a/100.jpg", "a/2.jpg"], key=lambda p: (p[0], int(p[2:-4])))
+    assert widget.paths() == ["a/10.jpg", "a/100.jpg"]
+    widget.setSearchPattern("")
+    assert widget.paths() == ["a/1.jpg", "a/2.jpg", "a/10.jpg", "a/100.jpg"]
+
+
+@pytest.mark.gui
+@pytest.mark.parametrize("filtered", [False, True])
+def test_FileListModel_insertPaths_large(qtbot, filtered):
+    def key(path):
+        return int(path[:-4])
+
+    def accepts(path):
+        return not filtered or key(path) % 4 != 1
+
+    widget = FileListWidget()
+    qtbot.addWidget(widget)
+    model = widget.model()
+    paths = ["{}.jpg".format(i) for i in range(0, 200000, 10)]
+    widget.setPaths(paths)
+    if filtered:
+        widget.setFilter(accepts)
+
+    inserted = []
+
+    def onRowsInserted(parent, first, last):
+        # the rows are in place as soon as each block is inserted
+        rows = range(max(0, first - 1), min(len(widget), last + 2))
+        neighbours = [key(widget.path(row)) for row in rows]
+        assert neighbours == sorted(neighbours)
+        inserted.extend(widget.path(row) for row in range(first, last + 1))
+
+    model.rowsInserted.connect(onRowsInserted)
+    random.seed(0)
+    new = ["{}.jpg".format(random.randrange(200000)) for _ in range(1000)]
+    model.insertPaths(new, key=key)
+
+    allPaths = sorted(set(paths) | set(new), key=key)
+    assert model.allPaths() == allPaths
+    expected = [p for p in allPaths if accepts(p)]
+    assert widget.paths() == expected
+    assert all(widget.row(p) == row for row, p in enumerate(expected))
+    added = set(new) - set(paths)
+    assert sorted(inserted, key=key) == [p for p in expected if p in added]